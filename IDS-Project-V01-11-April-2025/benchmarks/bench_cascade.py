@@ -0,0 +1,44 @@
+# Cascade (gate + full forest) against the single-model path on a replayed capture
+#   python benchmarks/bench_cascade.py [capture.pcap]
+# Without a capture, synthetic packets are used.
+import sys
+import time
+import contextlib
+import io
+import numpy as np
+from common import random_features, capture_features
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import monitoring
+
+artifacts = monitoring.model_handle.current
+if artifacts.cascade is None:
+    sys.exit(f"No gate model found at {monitoring.MODEL_PATHS['gate']}, run training.py first")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    samples = capture_features(sys.argv[1]) if len(sys.argv) > 1 else random_features(20000)
+X = artifacts.encoder.encode_batch(samples)
+print(f"{len(X)} packets")
+
+
+def run(predict, batch_size=64):
+    started = time.perf_counter()
+    probabilities = np.vstack([predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+    return probabilities, len(X) / (time.perf_counter() - started)
+
+
+cascade = artifacts.cascade
+single_probs, single_rate = run(artifacts.full_predict_proba)
+cascade_probs, cascade_rate = run(artifacts.predict_proba)
+
+single_verdicts = np.array(monitoring.apply_thresholds(single_probs)[0])
+cascade_verdicts = np.array(monitoring.apply_thresholds(cascade_probs)[0])
+single_attacks = single_verdicts != "normal"
+
+print(f"Short-circuited by the gate: {cascade.short_circuit_rate():.1%}")
+print(f"Verdict agreement with the single model: {(single_verdicts == cascade_verdicts).mean():.2%}")
+if single_attacks.any():
+    print(f"Attacks found by the single model also found by the cascade: "
+          f"{(cascade_verdicts[single_attacks] != 'normal').mean():.2%}")
+print(f"Throughput: single model {single_rate:,.0f} packets/s, cascade {cascade_rate:,.0f} packets/s "
+      f"({cascade_rate / single_rate:.1f}x)")
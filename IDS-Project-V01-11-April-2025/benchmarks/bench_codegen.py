@@ -0,0 +1,55 @@
+# Per-packet latency of the generated if/else evaluator against sklearn and the batched compiled forest
+import time
+import warnings
+import numpy as np
+import joblib
+from common import random_features
+from feature_encoder import FeatureEncoder
+from compiled_forest import compile_forest
+from tree_codegen import load_or_generate
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+MODEL_PATH = "models/rf_model_resampled.pkl"
+
+model = joblib.load(MODEL_PATH)
+encoder = FeatureEncoder(joblib.load("models/encoded_columns_resampled.pkl"))
+
+started = time.perf_counter()
+codegen = load_or_generate(MODEL_PATH, "models/rf_model_resampled_codegen.py", lambda: model)
+print(f"Loaded generated evaluator in {time.perf_counter() - started:.2f} s")
+compiled = compile_forest(model)
+
+samples = random_features(2000)
+X = encoder.encode_batch(samples)
+
+# Parity (sklearn sums tree votes in order when run single-threaded, exactly like the generated code)
+model.n_jobs = 1
+expected = model.predict_proba(X[:500])
+actual = codegen.predict_proba(X[:500])
+print(f"Parity over 500 rows: max |diff| = {np.abs(expected - actual).max():.2e}")
+assert np.abs(expected - actual).max() < 1e-9
+
+
+def per_packet(classify, n):
+    # Encode + classify one packet at a time, the way process_packet does
+    started = time.perf_counter()
+    for features in samples[:n]:
+        classify(encoder.encode(features))
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def batched(n, batch_size=64):
+    started = time.perf_counter()
+    for i in range(0, n, batch_size):
+        compiled.predict_proba(encoder.encode_batch(samples[i:i + batch_size]))
+    return (time.perf_counter() - started) / n * 1e6
+
+
+print(f"{'backend':<28} {'us/packet':>10}")
+for n_jobs in (2, 1):
+    model.n_jobs = n_jobs
+    print(f"{f'sklearn (n_jobs={n_jobs})':<28} {per_packet(model.predict_proba, 100):>10.1f}")
+print(f"{'compiled, batch of 1':<28} {per_packet(compiled.predict_proba, 2000):>10.1f}")
+print(f"{'compiled, batches of 64':<28} {batched(2000):>10.1f}")
+print(f"{'codegen, batch of 1':<28} {per_packet(lambda row: codegen.predict_one(row[0]), 2000):>10.1f}")
@@ -0,0 +1,33 @@
+# Parity check and throughput comparison of the compiled NumPy forest against sklearn's predict_proba
+import warnings
+import numpy as np
+import joblib
+from common import random_features, time_per_call
+from feature_encoder import FeatureEncoder
+from compiled_forest import compile_forest
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+model = joblib.load("models/rf_model_resampled.pkl")
+encoder = FeatureEncoder(joblib.load("models/encoded_columns_resampled.pkl"))
+forest = compile_forest(model)
+print(f"Compiled {forest.n_trees} trees, {len(forest.feature)} nodes, depth {forest.max_depth}")
+
+X = encoder.encode_batch(random_features(4096))
+
+# Parity: only the order of summing tree votes differs from sklearn
+expected = model.predict_proba(X)
+actual = forest.predict_proba(X)
+max_diff = np.abs(expected - actual).max()
+print(f"Parity over {len(X)} rows: max |diff| = {max_diff:.2e}, "
+      f"argmax identical: {np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1))}")
+assert max_diff < 1e-9
+
+print(f"{'batch':>6} {'sklearn rows/s':>16} {'compiled rows/s':>16} {'speedup':>8}")
+for batch_size in (1, 64, 4096):
+    batch = X[:batch_size]
+    repeat = max(3, 2000 // batch_size)
+    sklearn_time = time_per_call(model.predict_proba, repeat, batch)
+    compiled_time = time_per_call(forest.predict_proba, repeat, batch)
+    print(f"{batch_size:>6} {batch_size / sklearn_time:>16,.0f} {batch_size / compiled_time:>16,.0f} "
+          f"{sklearn_time / compiled_time:>7.1f}x")
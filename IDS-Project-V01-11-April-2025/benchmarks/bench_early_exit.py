@@ -0,0 +1,57 @@
+# Early-exit forest voting against full evaluation: identical verdicts, trees evaluated per packet and speedup.
+# Usage: python benchmarks/bench_early_exit.py [capture.pcap]  (random features when no capture is given)
+import sys
+import numpy as np
+import joblib
+from common import random_features, capture_features, time_per_call
+from feature_encoder import FeatureEncoder
+from compiled_forest import load_or_compile
+
+MODEL_PATH = "models/rf_model_resampled.pkl"
+THRESHOLD_LEVELS = {
+    "Low": {"DoS": 0.2, "Probe": 0.4, "R2L": 0.2, "U2R": 0.2, "normal": 0.5},
+    "Medium": {"DoS": 0.15, "Probe": 0.38, "R2L": 0.18, "U2R": 0.18, "normal": 0.5},
+    "High": {"DoS": 0.12, "Probe": 0.35, "R2L": 0.15, "U2R": 0.15, "normal": 0.5},
+}
+BATCH_SIZES = [64, 1024]
+
+
+def verdicts(probabilities, class_thresholds, normal_index):
+    """monitoring.apply_thresholds as class indices (normal_index when under threshold)."""
+    best = probabilities.argmax(axis=1)
+    under = probabilities[np.arange(len(best)), best] < class_thresholds[best]
+    return np.where(under, normal_index, best)
+
+
+forest = load_or_compile(MODEL_PATH, "models/rf_model_resampled_compiled", lambda: joblib.load(MODEL_PATH))
+encoder = FeatureEncoder(joblib.load("models/encoded_columns_resampled.pkl"))
+classes = list(joblib.load("models/label_encoder_resampled.pkl").classes_)
+normal_index = classes.index("normal")
+
+if len(sys.argv) > 1:
+    features = capture_features(sys.argv[1])
+    print(f"Replaying {len(features)} IP packets from {sys.argv[1]}")
+else:
+    features = random_features(4096)
+    print(f"{len(features)} random feature vectors (pass a .pcap to replay real traffic)")
+X = encoder.encode_batch(features)
+full = forest.predict_proba(X)
+
+print(f"{'sensitivity':<12} {'identical':>9} {'trees/packet':>13} {'settled early':>14} " +
+      " ".join(f"{f'speedup @{size}':>13}" for size in BATCH_SIZES))
+for level, thresholds in THRESHOLD_LEVELS.items():
+    class_thresholds = np.array([thresholds.get(label, 0.1) for label in classes])
+    early, trees = forest.predict_proba_early_exit(X, class_thresholds, normal_index)
+    identical = np.array_equal(verdicts(full, class_thresholds, normal_index),
+                               verdicts(early, class_thresholds, normal_index))
+    assert identical, f"early exit changed a verdict at sensitivity {level}"
+
+    speedups = []
+    for batch_size in BATCH_SIZES:
+        batches = [X[i:i + batch_size] for i in range(0, len(X), batch_size)]
+        full_time = sum(time_per_call(forest.predict_proba, 5, batch) for batch in batches)
+        early_time = sum(time_per_call(forest.predict_proba_early_exit, 5, batch, class_thresholds, normal_index)
+                         for batch in batches)
+        speedups.append(full_time / early_time)
+    print(f"{level:<12} {str(identical):>9} {trees.mean():>9.1f}/{forest.n_trees:<3} "
+          f"{(trees < forest.n_trees).mean():>14.0%} " + " ".join(f"{s:>12.2f}x" for s in speedups))
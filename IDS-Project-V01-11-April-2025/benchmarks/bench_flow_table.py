@@ -0,0 +1,105 @@
+# Connection records from flow_table.FlowTable: the KDD flag of scripted TCP exchanges, and on a capture how many
+# connection records the packets turn into (rows to classify), their flags and services, and the cost per packet.
+# Usage: python benchmarks/bench_flow_table.py [capture.pcap ...]
+import sys
+import time
+from collections import Counter
+import common  # puts mainscreen on the path
+from packet_parser import PacketHeader, scapy_header
+from flow_table import FlowTable, FIN, SYN, RST, ACK
+from timing_wheel import TimingWheel
+import monitoring
+
+CLIENT, SERVER = ("10.0.0.1", 40000), ("10.0.0.2", 80)
+PSH = 0x08
+
+# (expected flag, [(sender, tcp flags), ...]) with "c" = client, "s" = server
+EXCHANGES = [
+    ("SF", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("c", PSH | ACK), ("s", PSH | ACK), ("c", FIN | ACK),
+            ("s", FIN | ACK), ("c", ACK)]),
+    ("S0", [("c", SYN)]),
+    ("S0", [("c", SYN), ("c", SYN), ("c", SYN)]),
+    ("REJ", [("c", SYN), ("s", RST | ACK)]),
+    ("S1", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("c", PSH | ACK)]),
+    ("S2", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("c", FIN | ACK)]),
+    ("S3", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("s", FIN | ACK)]),
+    ("RSTO", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("c", RST)]),
+    ("RSTR", [("c", SYN), ("s", SYN | ACK), ("c", ACK), ("s", RST)]),
+    ("RSTOS0", [("c", SYN), ("c", RST)]),
+    ("SH", [("c", SYN), ("c", FIN)]),
+    ("SHR", [("s", SYN | ACK), ("s", FIN | ACK)]),
+    ("RSTRH", [("s", SYN | ACK), ("s", RST)]),
+    ("OTH", [("c", PSH | ACK), ("s", ACK)]),
+    ("OTH", [("c", PSH | ACK), ("s", ACK), ("c", RST)]),  # the RST brings its deadline forward
+]
+
+
+def tcp_header(sender, flags, payload=10):
+    (src, sport), (dst, dport) = (CLIENT, SERVER) if sender == "c" else (SERVER, CLIENT)
+    return PacketHeader(6, src, dst, "tcp", sport, dport, flags, 20 + payload, payload)
+
+
+def replay(packets):
+    """Feed (header, time) pairs through a FlowTable, ticking its wheel every second.
+
+    Returns the finished connections and the time each one was handed on.
+    """
+    records, emitted = [], []
+    wheel = TimingWheel(monitoring.WINDOW_TICK_MS / 1000)
+    table = FlowTable(wheel, lambda connection, now: (records.append(connection), emitted.append(now)),
+                      monitoring.FLOW_IDLE_TIMEOUTS, monitoring.FLOW_ATTEMPT_TIMEOUT, monitoring.FLOW_CLOSE_LINGER)
+    next_tick = packets[0][1] if packets else 0
+    for header, t in packets:
+        if t >= next_tick:
+            wheel.advance(t)
+            next_tick = t + wheel.tick_seconds
+        table.add(header, t)
+    # Keep ticking until everything timed out
+    t = packets[-1][1] if packets else 0
+    end = t + max(monitoring.FLOW_IDLE_TIMEOUTS.values()) + 2
+    while t < end:
+        t += wheel.tick_seconds
+        wheel.advance(t)
+    assert len(table) == 0, f"{len(table)} connections never timed out"
+    return records, emitted
+
+
+start = 1_700_000_000.0
+for expected, exchange in EXCHANGES:
+    packets = [(tcp_header(sender, flags), start + i * 0.01) for i, (sender, flags) in enumerate(exchange)]
+    records, emitted = replay(packets)
+    got = [connection.flag() for connection in records]
+    assert got == [expected], f"{exchange}: expected one {expected} connection, got {got}"
+    connection = records[0]
+    assert (connection.src, connection.sport) == CLIENT and connection.service == "http", connection.src
+    # Handed on within a tick of its timeout: close linger, attempt timeout or idle timeout
+    timeout = (monitoring.FLOW_CLOSE_LINGER if connection.closed else monitoring.FLOW_ATTEMPT_TIMEOUT
+               if expected in ("S0", "SH", "SHR") else monitoring.FLOW_IDLE_TIMEOUTS["tcp"])
+    late = emitted[0] - (connection.last + timeout)
+    assert 0 <= late <= monitoring.WINDOW_TICK_MS / 1000 + 1e-6, f"{expected} handed on {late:+.2f} s after its timeout"
+print(f"Scripted TCP exchanges: all {len(EXCHANGES)} give the expected KDD flag "
+      f"({', '.join(sorted({flag for flag, _ in EXCHANGES}))})")
+
+# An answered ping is two records, as in KDD: the echo request and the reply, each handed on as it arrives
+ping = [(PacketHeader(1, CLIENT[0], SERVER[0], "icmp", 0, 0, 8, 64, 56), start),
+        (PacketHeader(1, SERVER[0], CLIENT[0], "icmp", 0, 0, 0, 64, 56), start + 0.001)]
+records, emitted = replay(ping)
+assert [(c.service, c.flag(), c.src_bytes, c.dst_bytes) for c in records] == [("eco_i", "SF", 56, 0),
+                                                                              ("ecr_i", "SF", 56, 0)], records
+assert emitted == [t for _, t in ping], emitted
+print("Ping: one eco_i and one ecr_i record of 56 bytes, each handed on as it arrives")
+
+for path in sys.argv[1:]:
+    from scapy.all import rdpcap
+    packets = [(header, float(pkt.time)) for pkt in rdpcap(path) if (header := scapy_header(pkt)) is not None]
+    started = time.perf_counter()
+    records, _ = replay(packets)
+    elapsed = time.perf_counter() - started
+    assert sum(c.src_packets + c.dst_packets for c in records) == len(packets), "packets lost between connections"
+    flags = Counter(connection.flag() for connection in records)
+    services = Counter(connection.service for connection in records)
+    print(f"{path}: {len(packets)} packets -> {len(records)} connection records "
+          f"({len(packets) / max(len(records), 1):.1f} packets per classified row)")
+    print(f"  flags    {', '.join(f'{flag} {n}' for flag, n in flags.most_common())}")
+    print(f"  services {', '.join(f'{service} {n}' for service, n in services.most_common(8))}")
+    print(f"  {elapsed / max(len(packets), 1) * 1e6:.1f} us/packet in the flow table")
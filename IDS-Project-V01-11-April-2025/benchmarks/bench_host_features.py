@@ -0,0 +1,89 @@
+# The ten dst_host_* features from monitoring.add_traffic_features against a recount of the last
+# HOST_WINDOW_CONNECTIONS connections to the same host / service for every connection: identical values,
+# and the cost per connection of each.
+# Usage: python benchmarks/bench_host_features.py
+import time
+import random
+from collections import defaultdict
+import common  # puts mainscreen on the path
+from traffic_window import RecentConnections
+import monitoring
+
+CONNECTIONS = 50_000
+DESTINATIONS = 60
+SERVICES = ["http", "http_443", "private", "domain_u", "smtp", "ftp_data", "eco_i", "ecr_i"]
+FLAGS = ["SF"] * 6 + ["S0", "S1", "S2", "S3", "REJ", "RSTO", "RSTR", "SH", "OTH"]
+SOURCE_PORTS = [1024 + i for i in range(20)]
+HOST_COLUMNS = ("dst_host_count", "dst_host_srv_count", "dst_host_same_srv_rate", "dst_host_diff_srv_rate",
+                "dst_host_same_src_port_rate", "dst_host_srv_diff_host_rate", "dst_host_serror_rate",
+                "dst_host_srv_serror_rate", "dst_host_rerror_rate", "dst_host_srv_rerror_rate")
+
+
+def synthetic_connections(seed=11):
+    """(features, destination, source port, time) for skewed traffic, so busy hosts fill their rings and quiet ones don't."""
+    rng = random.Random(seed)
+    connections, t = [], 1_700_000_000.0
+    for _ in range(CONNECTIONS):
+        t += rng.expovariate(1 / 0.01)
+        dst = f"10.0.0.{min(int(rng.paretovariate(1.1)), DESTINATIONS)}"
+        features = {"service": rng.choice(SERVICES), "flag": rng.choice(FLAGS)}
+        connections.append((features, dst, rng.choice(SOURCE_PORTS), t))
+    return connections
+
+
+def incremental(connections):
+    """add_traffic_features on fresh host and service rings."""
+    monitoring.host_connections = RecentConnections(monitoring.HOST_WINDOW_CONNECTIONS, 2)
+    monitoring.service_connections = RecentConnections(monitoring.HOST_WINDOW_CONNECTIONS, 1)
+    rows = []
+    for features, dst, sport, t in connections:
+        features = monitoring.add_traffic_features(dict(features), dst, sport, t)
+        rows.append(tuple(features[column] for column in HOST_COLUMNS))
+    return rows
+
+
+def recount(connections):
+    """Every feature recounted from the last connections to the host and to the service, as KDD defines them."""
+    size = monitoring.HOST_WINDOW_CONNECTIONS
+    by_host, by_service, rows = defaultdict(list), defaultdict(list), []
+    for features, dst, sport, _ in connections:
+        service, flag = features["service"], features["flag"]
+        by_host[dst].append((service, sport, flag))
+        by_service[service].append((dst, flag))
+        host = by_host[dst][-size:]
+        same_service = sum(1 for srv, _, _ in host if srv == service)
+        service_window = by_service[service][-size:]
+        other_hosts = sum(1 for host_ip, _ in service_window if host_ip != dst)
+        rows.append((
+            len(host), len(service_window),
+            same_service / len(host),
+            (len(host) - same_service) / len(host),
+            sum(1 for _, port, _ in host if port == sport) / len(host),
+            other_hosts / len(service_window),
+            sum(1 for *_, f in host if f in ("S0", "S1", "S2", "S3")) / len(host),
+            sum(1 for _, f in service_window if f in ("S0", "S1", "S2", "S3")) / len(service_window),
+            sum(1 for *_, f in host if f == "REJ") / len(host),
+            sum(1 for _, f in service_window if f == "REJ") / len(service_window),
+        ))
+    return rows
+
+
+connections = synthetic_connections()
+started = time.perf_counter()
+expected = recount(connections)
+reference = time.perf_counter() - started
+started = time.perf_counter()
+got = incremental(connections)
+rings = time.perf_counter() - started
+
+mismatches = [(i, e, g) for i, (e, g) in enumerate(zip(expected, got)) if e != g]
+for i, e, g in mismatches[:10]:
+    print(f"  connection {i}: " + ", ".join(f"{c} {a} != {b}" for c, a, b in zip(HOST_COLUMNS, e, g) if a != b))
+assert not mismatches, f"{len(mismatches)} connections got different dst_host_* features"
+
+full_rings = sum(1 for ring in monitoring.host_connections.rings.values() if len(ring.entries) == monitoring.HOST_WINDOW_CONNECTIONS)
+print(f"{CONNECTIONS} connections to {len(monitoring.host_connections)} hosts ({full_rings} with a full ring of "
+      f"{monitoring.HOST_WINDOW_CONNECTIONS}): all ten dst_host_* features identical to a recount")
+print(f"  recount of the last connections {reference / CONNECTIONS * 1e6:8.1f} us/connection")
+print(f"  running totals                  {rings / CONNECTIONS * 1e6:8.1f} us/connection "
+      f"(whole add_traffic_features, time windows included)")
@@ -0,0 +1,79 @@
+# Load time and memory of the pickled sklearn model against the memory-mapped compiled forest,
+# first in this process and then across several worker processes that each load the model and predict.
+# Needs psutil. PSS (memory with shared pages split between processes) is only reported on Linux.
+import os
+import sys
+import time
+import warnings
+import multiprocessing
+import numpy as np
+import joblib
+import psutil
+from common import random_features
+from feature_encoder import FeatureEncoder
+from compiled_forest import CompiledForest, load_or_compile, current_version
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+MODEL_PATH = "models/rf_model_resampled.pkl"
+COMPILED_PATH = "models/rf_model_resampled_compiled"
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+
+def load_pickle():
+    return joblib.load(MODEL_PATH)
+
+
+def load_mmap():
+    return CompiledForest.load(current_version(COMPILED_PATH))
+
+
+def memory_mb():
+    info = psutil.Process().memory_full_info()
+    return info.rss / 1e6, getattr(info, "pss", info.uss) / 1e6
+
+
+def worker(loader, rows, ready, done):
+    model = loader()
+    model.predict_proba(rows)
+    ready.put(memory_mb())
+    done.wait()
+
+
+def measure_workers(loader, rows):
+    """Average (rss, pss) in MB of WORKERS processes that all hold the model at the same time."""
+    ctx = multiprocessing.get_context("spawn")
+    ready, done = ctx.Queue(), ctx.Event()
+    processes = [ctx.Process(target=worker, args=(loader, rows, ready, done)) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    samples = [ready.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return np.mean(samples, axis=0)
+
+
+if __name__ == "__main__":
+    # Make sure the compiled folder is up to date before timing it
+    load_or_compile(MODEL_PATH, COMPILED_PATH, load_pickle)
+    rows = FeatureEncoder(joblib.load("models/encoded_columns_resampled.pkl")).encode_batch(random_features(64))
+
+    print(f"{'artifact':<16} {'load ms':>9} {'first batch ms':>15} {'RSS +MB':>8}")
+    for name, loader in (("pickle (sklearn)", load_pickle), ("compiled (mmap)", load_mmap)):
+        rss_before, _ = memory_mb()
+        started = time.perf_counter()
+        model = loader()
+        loaded = time.perf_counter()
+        model.predict_proba(rows)
+        finished = time.perf_counter()
+        rss_after, _ = memory_mb()
+        print(f"{name:<16} {(loaded - started) * 1000:>9.1f} {(finished - loaded) * 1000:>15.1f} "
+              f"{rss_after - rss_before:>8.1f}")
+        del model
+
+    print(f"\n{WORKERS} worker processes, each loading the model and classifying one batch:")
+    print(f"{'artifact':<16} {'RSS MB/proc':>12} {'PSS MB/proc':>12}")
+    for name, loader in (("pickle (sklearn)", load_pickle), ("compiled (mmap)", load_mmap)):
+        rss, pss = measure_workers(loader, rows)
+        print(f"{name:<16} {rss:>12.1f} {pss:>12.1f}")
@@ -0,0 +1,93 @@
+# count / srv_count / same_srv_rate / diff_srv_rate from monitoring.extract_features against a brute-force
+# recount of the whole window for every packet: identical values, and the cost per packet of each.
+# Usage: python benchmarks/bench_service_counters.py [capture.pcap ...]  (synthetic traffic when none is given)
+import sys
+import time
+import random
+from bisect import bisect_right
+import common  # puts mainscreen on the path
+from packet_parser import PacketHeader, scapy_header
+from traffic_window import SlidingWindows
+from timing_wheel import TimingWheel
+import monitoring
+
+SYNTHETIC_PACKETS = 20_000
+DESTINATIONS = 40
+PORTS = {"tcp": [80, 80, 443, 22, 8080], "udp": [53, 53, 123]}
+TICK_SECONDS = monitoring.WINDOW_TICK_MS / 1000
+TRAFFIC_COLUMNS = ("count", "srv_count", "same_srv_rate", "diff_srv_rate")
+
+
+def synthetic_packets(seed=7):
+    """Bursty traffic spread over several windows, so keys go idle, expire and come back."""
+    rng = random.Random(seed)
+    destinations = [f"10.0.{i // 256}.{i % 256}" for i in range(DESTINATIONS)]
+    packets, t = [], 1_700_000_000.0
+    for _ in range(SYNTHETIC_PACKETS):
+        t += rng.expovariate(1 / 0.002) if rng.random() < 0.99 else rng.uniform(5, 90)
+        dst = destinations[min(int(rng.paretovariate(1.2)) - 1, DESTINATIONS - 1)]
+        if rng.random() < 0.1:
+            packets.append((PacketHeader(1, "192.168.1.10", dst, "icmp", 0, 0, 0, 64, 56), t))
+            continue
+        l4 = rng.choice(("tcp", "udp"))
+        packets.append((PacketHeader(6 if l4 == "tcp" else 17, "192.168.1.10", dst, l4, rng.randrange(1024, 65536),
+                                     rng.choice(PORTS[l4]), 24 if l4 == "tcp" else 0, 540, 500), t))
+    return packets
+
+
+def capture_packets(path):
+    from scapy.all import rdpcap
+    return [(header, float(pkt.time)) for pkt in rdpcap(path) if (header := scapy_header(pkt)) is not None]
+
+
+def incremental(packets):
+    """extract_features on fresh windows, with the wheel ticking as the controller's timer would."""
+    wheel = TimingWheel(TICK_SECONDS)
+    monitoring.packet_history = SlidingWindows(monitoring.traffic_window, wheel)
+    monitoring.service_history = SlidingWindows(monitoring.traffic_window, wheel)
+    monitoring.dst_service_history = SlidingWindows(monitoring.traffic_window, wheel)
+    rows, next_tick = [], packets[0][1]
+    for header, t in packets:
+        if t >= next_tick:
+            wheel.advance(t)
+            next_tick = t + TICK_SECONDS
+        features = monitoring.extract_features(header, t)
+        rows.append(tuple(features[column] for column in TRAFFIC_COLUMNS))
+    return rows
+
+
+def brute_force(packets):
+    """Recount every packet still in the window, as the KDD definitions read."""
+    times, seen, rows = [], [], []
+    for header, t in packets:
+        service = monitoring.extract_features(header, t)["service"]
+        times.append(t)
+        seen.append((header.dst, service))
+        window = seen[bisect_right(times, t - monitoring.traffic_window):]
+        count = sum(1 for dst, _ in window if dst == header.dst)
+        same_service = sum(1 for key in window if key == (header.dst, service))
+        rows.append((count, sum(1 for _, srv in window if srv == service),
+                     same_service / count, (count - same_service) / count))
+    return rows
+
+
+sources = sys.argv[1:] or ["(synthetic traffic)"]
+for source in sources:
+    packets = capture_packets(source) if sys.argv[1:] else synthetic_packets()
+
+    started = time.perf_counter()
+    expected = brute_force(packets)
+    reference = time.perf_counter() - started
+    started = time.perf_counter()
+    got = incremental(packets)
+    windows = time.perf_counter() - started
+
+    mismatches = [(i, e, g) for i, (e, g) in enumerate(zip(expected, got)) if e != g]
+    for i, e, g in mismatches[:10]:
+        print(f"  packet {i}: expected {dict(zip(TRAFFIC_COLUMNS, e))}\n  {'':>{len(str(i)) + 8}}got      {dict(zip(TRAFFIC_COLUMNS, g))}")
+    assert not mismatches, f"{len(mismatches)} packets of {source} got different traffic features"
+
+    n = max(len(packets), 1)
+    print(f"{source}: {len(packets)} packets, {', '.join(TRAFFIC_COLUMNS)} identical to a full recount")
+    print(f"  full recount     {reference / n * 1e6:10.1f} us/packet")
+    print(f"  sliding windows  {windows / n * 1e6:10.1f} us/packet (whole extract_features)")
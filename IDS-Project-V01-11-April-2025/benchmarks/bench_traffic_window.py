@@ -0,0 +1,88 @@
+# Per-packet cost of extract_features as the traffic window fills up, against the old per-packet list rebuild,
+# and cost of a timing-wheel expiry tick as the number of live keys grows, against scanning every key.
+# Usage: python benchmarks/bench_traffic_window.py
+import time
+import random
+from collections import defaultdict
+import common  # puts mainscreen on the path
+from packet_parser import PacketHeader
+from traffic_window import SlidingWindows
+from timing_wheel import TimingWheel
+import monitoring
+
+OCCUPANCIES = [1_000, 10_000, 100_000, 1_000_000, 3_000_000]  # packets inside the 60 s window
+LEGACY_MAX_OCCUPANCY = 100_000  # the old code takes seconds per packet beyond this
+DESTINATIONS = 5_000
+TIMED_PACKETS = 20_000
+LEGACY_TIMED_PACKETS = 20
+LIVE_KEYS = [10_000, 100_000, 1_000_000]
+EXPIRING_PER_TICK = 1_000
+TICKS = 10
+
+
+def legacy_count(history, dst_ip, current_time, window):
+    """The traffic window as extract_features used to keep it: every list rebuilt on every packet."""
+    history[dst_ip].append(current_time)
+    for ip in list(history.keys()):
+        history[ip] = [t for t in history[ip] if t > current_time - window]
+        if not history[ip]:
+            del history[ip]
+    return len(history.get(dst_ip, []))
+
+
+rng = random.Random(42)
+destinations = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(DESTINATIONS)]
+headers = [PacketHeader(6, "192.168.1.10", dst, "tcp", 40000, 80, 24, 540, 500) for dst in destinations]
+window = monitoring.traffic_window
+start = 1_700_000_000.0
+
+print(f"{'packets in window':>17} {'extract_features us/packet':>27} {'old list rebuild us/packet':>27}")
+for occupancy in OCCUPANCIES:
+    # Spread the packets over the first 50 s of the window, so none expire while timing
+    windows = SlidingWindows(window, TimingWheel())
+    legacy = defaultdict(list)
+    step = 50.0 / occupancy
+    for i in range(occupancy):
+        dst = destinations[rng.randrange(DESTINATIONS)]
+        windows.add(dst, start + i * step)
+        if occupancy <= LEGACY_MAX_OCCUPANCY:
+            legacy[dst].append(start + i * step)
+    monitoring.packet_history = windows
+
+    now = start + 50.0
+    picks = [rng.randrange(DESTINATIONS) for _ in range(TIMED_PACKETS)]
+    started = time.perf_counter()
+    for i, pick in enumerate(picks):
+        monitoring.extract_features(headers[pick], now + i * 1e-6)
+    current = (time.perf_counter() - started) / TIMED_PACKETS
+
+    if occupancy <= LEGACY_MAX_OCCUPANCY:
+        started = time.perf_counter()
+        for i, pick in enumerate(picks[:LEGACY_TIMED_PACKETS]):
+            legacy_count(legacy, destinations[pick], now + i * 1e-6, window)
+        old = f"{(time.perf_counter() - started) / LEGACY_TIMED_PACKETS * 1e6:>27.1f}"
+    else:
+        old = f"{'(skipped)':>27}"
+    print(f"{occupancy:>17,} {current * 1e6:>27.1f} {old}")
+
+# EXPIRING_PER_TICK keys fall out of the window on each of the first TICKS ticks; all the others stay live
+print(f"\n{'live keys':>17} {'expired per tick':>17} {'wheel ms/tick':>14} {'scan all keys ms':>17}")
+for live_keys in LIVE_KEYS:
+    wheel = TimingWheel()
+    windows = SlidingWindows(window, wheel)
+    n_expiring = EXPIRING_PER_TICK * TICKS
+    for i in range(live_keys):
+        t = start + i / EXPIRING_PER_TICK if i < n_expiring else start + window - 1
+        windows.add(i, t)
+
+    wheel.advance(start + window - 0.5)
+    started = time.perf_counter()
+    expired = sum(wheel.advance(start + window + tick) for tick in range(TICKS))
+    per_tick = (time.perf_counter() - started) / TICKS
+
+    # What a sweep over every key costs, even when it finds nothing to drop
+    started = time.perf_counter()
+    horizon = start
+    idle = [key for key, timestamps in windows.history.pairs() if timestamps[-1] <= horizon]
+    scan = time.perf_counter() - started
+    print(f"{live_keys:>17,} {expired / TICKS:>17,.0f} {per_tick * 1000:>14.2f} {scan * 1000:>17.2f}")
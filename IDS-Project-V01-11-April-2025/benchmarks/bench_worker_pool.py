@@ -0,0 +1,59 @@
+# Throughput of the shared-memory worker pool (worker_pool.py) from 1 to N inference processes,
+# compared with classifying in a single process. Usage: python benchmarks/bench_worker_pool.py [max_workers]
+import os
+import sys
+import time
+import warnings
+import numpy as np
+from common import random_features
+from model_handle import ModelArtifacts
+from worker_pool import InferencePool
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+PATHS = {
+    "model": "models/rf_model_resampled.pkl",
+    "encoded_columns": "models/encoded_columns_resampled.pkl",
+    "label_encoder": "models/label_encoder_resampled.pkl",
+    "compiled": "models/rf_model_resampled_compiled",
+    "codegen": "models/rf_model_resampled_codegen.py",
+    "gate": "models/gate_model_resampled.pkl",
+}
+BATCH_SIZE = 64
+N_BATCHES = 400
+MAX_WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+
+
+def run_pool(artifacts, batches, n_workers):
+    results = []
+    pool = InferencePool(PATHS, "compiled", False, n_workers, artifacts.encoder.n_features, len(artifacts.classes),
+                         lambda contexts, probabilities: results.append(probabilities), max_batch_size=BATCH_SIZE)
+    pool.wait_ready()
+    started = time.perf_counter()
+    for batch in batches:
+        pool.submit(batch, None, artifacts.version, len(artifacts.classes))
+        pool.collect()
+    pool.drain()
+    elapsed = time.perf_counter() - started
+    stats = pool.worker_stats()
+    pool.close()
+    return np.concatenate(results), elapsed, stats
+
+
+if __name__ == "__main__":
+    artifacts = ModelArtifacts(PATHS, "compiled", use_cascade=False)
+    rows = artifacts.encoder.encode_batch(random_features(BATCH_SIZE * N_BATCHES))
+    batches = [rows[i:i + BATCH_SIZE] for i in range(0, len(rows), BATCH_SIZE)]
+
+    started = time.perf_counter()
+    expected = np.concatenate([artifacts.predict_proba(batch) for batch in batches])
+    single = len(rows) / (time.perf_counter() - started)
+    print(f"in-process: {single:,.0f} rows/s")
+
+    print(f"{'workers':>7} {'rows/s':>10} {'speedup':>8}  per-worker rows/s")
+    for n_workers in range(1, MAX_WORKERS + 1):
+        actual, elapsed, stats = run_pool(artifacts, batches, n_workers)
+        assert np.array_equal(actual, expected), "worker results differ from in-process results"
+        throughput = len(rows) / elapsed
+        print(f"{n_workers:>7} {throughput:>10,.0f} {throughput / single:>7.2f}x  " +
+              " ".join(f"{w['rows_per_s']:,.0f}" for w in stats))
@@ -0,0 +1,58 @@
+# Shared helpers for the benchmark scripts. Run the benchmarks from the project folder
+# (the one containing models/), e.g.  python benchmarks/bench_compiled_forest.py
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mainscreen"))
+
+PROTOCOLS = ["tcp", "udp", "icmp"]
+SERVICES = {"tcp": ["http", "https", "tcp"], "udp": ["dns", "udp"], "icmp": ["other"]}
+TCP_FLAGS = [2, 16, 18, 24, 4, 17]
+
+
+def random_features(n, seed=42):
+    """Feature dicts shaped like the ones monitoring.extract_features produces."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n):
+        protocol = rng.choice(PROTOCOLS)
+        payload = rng.choice([0, 0, 42, 100, 512, 1024, 1460])
+        count = rng.randint(1, 600)
+        same_service = rng.randint(1, count)  # this destination's packets to the same service
+        samples.append({
+            "protocol_type": protocol,
+            "src_bytes": payload,
+            "dst_bytes": payload,
+            "service": rng.choice(SERVICES[protocol]),
+            "flag": rng.choice(TCP_FLAGS) if protocol == "tcp" else 0,
+            "count": count,
+            "srv_count": same_service + rng.randint(0, 600),  # plus the service's packets to other destinations
+            "same_srv_rate": same_service / count,
+            "diff_srv_rate": (count - same_service) / count,
+        })
+    return samples
+
+
+def capture_features(pcap_path):
+    """Replay a capture through monitoring.extract_features, using the packets' own timestamps."""
+    from scapy.all import rdpcap
+    from packet_parser import scapy_header
+    import monitoring
+
+    samples = []
+    for pkt in rdpcap(pcap_path):
+        header = scapy_header(pkt)
+        if header is not None:
+            samples.append(monitoring.extract_features(header, float(pkt.time)))
+    return samples
+
+
+def time_per_call(fn, repeat, *args):
+    """Average wall time of fn(*args) in seconds."""
+    fn(*args)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - started) / repeat
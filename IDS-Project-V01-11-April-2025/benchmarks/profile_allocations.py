@@ -0,0 +1,76 @@
+# Memory allocated by the classifier stage (encode into the batch buffer, classify, decode verdicts), traced with tracemalloc.
+# Shows what stays allocated per packet once the buffers are warm, and the short-lived peak per batch,
+# next to encoding every batch into a fresh float64 matrix as before.
+# Usage: python benchmarks/profile_allocations.py
+import tracemalloc
+import numpy as np
+from common import random_features
+from batching import MicroBatcher
+from feature_encoder import FeatureEncoder
+import monitoring
+
+N_PACKETS = 64 * 600
+WARM_UP_BATCHES = 150  # enough misses to fill the verdict cache, which then stays at its size
+BATCH_SIZE = monitoring.BATCH_SIZE
+
+artifacts = monitoring.model_handle.current
+samples = random_features(N_PACKETS)
+# No deadline flushes: every batch is exactly BATCH_SIZE rows
+batcher = MicroBatcher(artifacts.encoder.n_features, monitoring.classify,
+                       lambda contexts, probabilities: monitoring.apply_thresholds(probabilities),
+                       max_batch_size=BATCH_SIZE, max_delay_ms=10 ** 9)
+# Encoding alone: the rows are handed on unclassified
+encode_only = MicroBatcher(artifacts.encoder.n_features, None, lambda contexts, rows: None,
+                           max_batch_size=BATCH_SIZE, max_delay_ms=10 ** 9)
+fresh_encoder = FeatureEncoder(artifacts.encoded_columns, dtype=np.float64)
+
+
+def reused_buffer(batch):
+    for features in batch:
+        batcher.add(artifacts.encoder, features, None)
+
+
+def reused_buffer_encode_only(batch):
+    for features in batch:
+        encode_only.add(artifacts.encoder, features, None)
+
+
+def fresh_matrix(batch):
+    monitoring.apply_thresholds(monitoring.classify(fresh_encoder.encode_batch(batch)))
+
+
+def profile(run_batch):
+    batches = [samples[i:i + BATCH_SIZE] for i in range(0, N_PACKETS, BATCH_SIZE)]
+    # Traced from the start, so memory freed after the warm-up (e.g. evicted cache entries) is subtracted
+    tracemalloc.start()
+    for batch in batches[:WARM_UP_BATCHES]:
+        run_batch(batch)
+
+    before = tracemalloc.take_snapshot()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for batch in batches[WARM_UP_BATCHES:]:
+        tracemalloc.reset_peak()
+        run_batch(batch)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    n_packets = (len(batches) - WARM_UP_BATCHES) * BATCH_SIZE
+    top = after.compare_to(before, "lineno")[:5]
+    return retained / n_packets, peak, top
+
+
+print(f"{N_PACKETS} packets in batches of {BATCH_SIZE}, {WARM_UP_BATCHES} warm-up batches\n")
+print(f"{'path':<28} {'retained B/packet':>18} {'peak KB/batch':>14}")
+results = {}
+for name, run_batch in (("reused float32 buffer", reused_buffer), ("  of which encoding", reused_buffer_encode_only),
+                        ("fresh float64 matrix", fresh_matrix)):
+    per_packet, peak, top = profile(run_batch)
+    results[name] = top
+    print(f"{name:<28} {per_packet:>18.2f} {peak / 1024:>14.1f}")
+
+print("\nLargest retained allocations, reused float32 buffer:")
+for stat in results["reused float32 buffer"]:
+    print(f"  {stat}")
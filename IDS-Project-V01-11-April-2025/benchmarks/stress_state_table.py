@@ -0,0 +1,71 @@
+# Detector state under a flood of distinct keys: every packet goes to a new destination and opens a new
+# connection, as in a spoofed SYN flood or a scan. The traffic windows, connection rings and the flow table
+# are bounded by monitoring.STATE_MAX_KEYS / STATE_MAX_BYTES, so once they are full the process memory
+# (RSS) must stay flat while keys keep being evicted. Prints RSS, estimated state memory and evictions
+# every tenth of the run.
+# Needs psutil. Usage: python benchmarks/stress_state_table.py [distinct keys, default 10000000]
+import sys
+import time
+import psutil
+import common  # puts mainscreen on the path
+from packet_parser import PacketHeader
+from flow_table import FlowTable, SYN
+import monitoring
+
+KEYS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+KEYS_PER_SECOND = 100_000  # simulated packet rate
+RSS_GROWTH_LIMIT = 0.05  # allowed RSS growth between the second checkpoint and the last
+
+
+def mb(n):
+    return n / 1e6
+
+
+records = 0
+
+
+def count_record(connection, now):
+    global records
+    records += 1
+
+
+flows = FlowTable(monitoring.window_wheel, count_record, monitoring.FLOW_IDLE_TIMEOUTS,
+                  monitoring.FLOW_ATTEMPT_TIMEOUT, monitoring.FLOW_CLOSE_LINGER,
+                  monitoring.STATE_MAX_KEYS, monitoring.STATE_MAX_BYTES)
+process = psutil.Process()
+checkpoints = []
+step = max(KEYS // 10, 1)
+t = start = 1_700_000_000.0
+next_tick = t + monitoring.window_wheel.tick_seconds
+started = time.perf_counter()
+
+print(f"{KEYS} distinct keys at {KEYS_PER_SECOND} packets/s simulated, caps {monitoring.STATE_MAX_KEYS} keys / "
+      f"{mb(monitoring.STATE_MAX_BYTES):.0f} MB per table")
+for i in range(1, KEYS + 1):
+    t = start + i / KEYS_PER_SECOND
+    if t >= next_tick:
+        monitoring.window_wheel.advance(t)
+        next_tick += monitoring.window_wheel.tick_seconds
+    dst = f"{10 + (i >> 24)}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+    header = PacketHeader(6, "192.0.2.1", dst, "tcp", 1024 + i % 60000, 80, SYN, 40, 0)
+    monitoring.extract_features(header, t)
+    monitoring.attack_timestamps.add(i, t)
+    flows.add(header, t)
+
+    if i % step == 0:
+        stats = list(monitoring.window_stats().values()) + [flows.stats()]
+        state_bytes = sum(s["bytes"] for s in stats)
+        assert all(s["keys"] <= monitoring.STATE_MAX_KEYS for s in stats), "a table passed the key cap"
+        assert all(s["bytes"] <= monitoring.STATE_MAX_BYTES for s in stats), "a table passed the byte cap"
+        rss = process.memory_info().rss
+        checkpoints.append(rss)
+        print(f"  {i:>10} keys  RSS {mb(rss):7.1f} MB  state {mb(state_bytes):6.1f} MB  "
+              f"wheel {monitoring.window_wheel.scheduled:>7} keys  "
+              f"evicted {sum(s['evictions'] for s in stats):>10} "
+              f"({sum(s['pressure_evictions'] for s in stats)} over the byte cap)  "
+              f"{records} connection records  {time.perf_counter() - started:6.0f} s")
+
+if len(checkpoints) >= 3:
+    growth = checkpoints[-1] / checkpoints[1] - 1
+    print(f"RSS growth from the second checkpoint to the last: {growth:+.1%}")
+    assert growth <= RSS_GROWTH_LIMIT, f"RSS grew by {growth:.1%} while the tables were full"
@@ -0,0 +1,58 @@
+# KDD99 dataset loading and model saving shared by training.py and prune_forest.py
+import os
+import joblib
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# Location of the KDD99 CSV
+file_path = "D:/Project/data/KDDCup99.csv"
+columns = [
+    "duration", "protocol_type", "service", "flag", "src_bytes", "dst_bytes", 
+    "land", "wrong_fragment", "urgent", "hot", "num_failed_logins", 
+    "logged_in", "num_compromised", "root_shell", "su_attempted", "num_root", 
+    "num_file_creations", "num_shells", "num_access_files", "num_outbound_cmds", 
+    "is_host_login", "is_guest_login", "count", "srv_count", "serror_rate", 
+    "srv_serror_rate", "rerror_rate", "srv_rerror_rate", "same_srv_rate", 
+    "diff_srv_rate", "srv_diff_host_rate", "dst_host_count", "dst_host_srv_count", 
+    "dst_host_same_srv_rate", "dst_host_diff_srv_rate", 
+    "dst_host_same_src_port_rate", "dst_host_srv_diff_host_rate", 
+    "dst_host_serror_rate", "dst_host_srv_serror_rate", 
+    "dst_host_rerror_rate", "dst_host_srv_rerror_rate", "label"
+]
+
+# Map attack categories
+def map_attack_category(label):
+    if label == "normal":
+        return "normal"
+    elif label in ["neptune", "smurf", "pod", "teardrop", "back", "land"]:
+        return "DoS"
+    elif label in ["satan", "ipsweep", "nmap", "portsweep"]:
+        return "Probe"
+    elif label in ["buffer_overflow", "loadmodule", "rootkit", "perl"]:
+        return "U2R"
+    elif label in ["guess_passwd", "ftp_write", "imap", "phf", "multihop", "warezmaster", "warezclient", "spy"]:
+        return "R2L"
+    else:
+        return "unknown"
+
+
+def load_dataset(path=file_path):
+    """Read the KDD99 CSV, map labels to attack categories and one-hot encode the categorical columns."""
+    data = pd.read_csv(path, header=None, names=columns, low_memory=False)
+    data['label'] = data['label'].apply(map_attack_category)
+    data = data[data['label'] != "unknown"]
+
+    # Encode categorical variables
+    return pd.get_dummies(data, columns=["protocol_type", "service", "flag"], drop_first=True)
+
+
+def split_dataset(X, y):
+    """The train/test split used for every model, so held-out rows are the same across scripts."""
+    return train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+
+
+def save_artifact(obj, path):
+    """joblib.dump to a temporary file, then swap it in, so a running monitor never loads a half-written file."""
+    temp_path = path + ".tmp"
+    joblib.dump(obj, temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,98 @@
+import time
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects feature rows and classifies them together.
+
+    Features are encoded straight into a float32 (max_batch_size, n_features) buffer
+    owned by the batcher and reused for every batch; only the slots a row touched
+    last time are reset (see FeatureEncoder.encode_into).
+
+    A batch is flushed through classify_fn when it reaches max_batch_size rows or
+    when its oldest row has waited max_delay_ms, whichever comes first. The caller
+    is expected to call poll() periodically (e.g. from a QTimer) so that a partial
+    batch still goes out on time when traffic is slow.
+
+    With classify_fn=None the batch is not classified here: on_batch receives the raw
+    rows instead (e.g. to hand them to worker_pool.InferencePool) and must copy them.
+    """
+
+    def __init__(self, n_features, classify_fn, on_batch, max_batch_size=64, max_delay_ms=50,
+                 dtype=np.float32):
+        self.classify_fn = classify_fn
+        self.on_batch = on_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+
+        self.rows = np.zeros((max_batch_size, n_features), dtype=dtype)
+        self.touched = [[] for _ in range(max_batch_size)]  # offsets written into each row
+        self.contexts = []
+        self.first_added = None
+
+        # Per-batch report of the last flush
+        self.last_batch_size = 0
+        self.last_wait_ms = 0.0
+        self.last_inference_ms = 0.0
+        self.total_batches = 0
+        self.total_rows = 0
+
+    def resize(self, n_features):
+        """Switch to a different row width (e.g. after a model swap). Only valid while empty."""
+        if self.contexts:
+            raise RuntimeError("cannot resize a batcher with pending rows")
+        if self.rows.shape[1] != n_features:
+            self.rows = np.zeros((self.max_batch_size, n_features), dtype=self.rows.dtype)
+            self.touched = [[] for _ in range(self.max_batch_size)]
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def add(self, encoder, features, context):
+        """Encode one feature dict into the next row and queue it with whatever the caller
+        needs back after classification."""
+        n = len(self.contexts)
+        if n == 0:
+            self.first_added = time.perf_counter()
+        encoder.encode_into(features, self.rows[n], self.touched[n])
+        self.contexts.append(context)
+
+        if n + 1 >= self.max_batch_size:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self):
+        """Flush the pending batch if its oldest row has waited long enough."""
+        if self.contexts and time.perf_counter() - self.first_added >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        n = len(self.contexts)
+        if n == 0:
+            return
+
+        contexts = self.contexts
+        self.contexts = []
+        started = time.perf_counter()
+        wait = started - self.first_added
+        self.first_added = None
+
+        if self.classify_fn is None:
+            self.last_batch_size = n
+            self.last_wait_ms = wait * 1000.0
+            self.total_batches += 1
+            self.total_rows += n
+            self.on_batch(contexts, self.rows[:n])
+            return
+
+        probabilities = self.classify_fn(self.rows[:n])
+        finished = time.perf_counter()
+
+        self.last_batch_size = n
+        self.last_wait_ms = wait * 1000.0
+        self.last_inference_ms = (finished - started) * 1000.0
+        self.total_batches += 1
+        self.total_rows += n
+
+        self.on_batch(contexts, probabilities)
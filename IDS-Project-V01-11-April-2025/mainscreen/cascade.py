@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class Cascade:
+    """Two-stage classifier: a small normal-vs-attack gate in front of the full forest.
+
+    Rows whose gate attack probability is below the tuned threshold are answered
+    as "normal" straight away; only the rest are sent to the multi-class model.
+    """
+
+    def __init__(self, gate_model, threshold, n_classes, normal_index):
+        self.gate_model = gate_model
+        self.threshold = threshold
+        self.n_classes = n_classes
+        self.normal_index = normal_index
+
+        self.packets = 0
+        self.short_circuited = 0
+
+    def predict_proba(self, rows, full_predict):
+        attack_probs = self.gate_model.predict_proba(rows)[:, 1]
+        flagged = np.flatnonzero(attack_probs >= self.threshold)
+
+        probabilities = np.zeros((len(rows), self.n_classes))
+        probabilities[:, self.normal_index] = 1.0
+        if len(flagged):
+            probabilities[flagged] = full_predict(rows[flagged])
+
+        self.packets += len(rows)
+        self.short_circuited += len(rows) - len(flagged)
+        return probabilities
+
+    def short_circuit_rate(self):
+        return self.short_circuited / self.packets if self.packets else 0.0
@@ -0,0 +1,255 @@
+import os
+import json
+import shutil
+import numpy as np
+from tree_codegen import file_hash
+
+
+class CompiledForest:
+    """A RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    All trees share one node table (feature, threshold, children, value) and are
+    walked together one level at a time, so a whole batch is classified with
+    max_depth vectorized steps instead of going through sklearn's predict_proba.
+    Leaves point to themselves, so samples that reach a leaf early just stay there.
+
+    Saved as a folder of .npy files that load() memory-maps: opening it costs about
+    the same for any forest size and every process shares one page-cache copy.
+    """
+
+    ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes")
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes, model_hash=None):
+        self.feature = feature
+        self.threshold = threshold
+        # children[2 * node + go_right] is the next node, so a level is a single take()
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.model_hash = model_hash
+        self.n_trees = len(roots)
+        self.n_classes = value.shape[1]
+
+    def predict_proba(self, X):
+        # sklearn compares float32 inputs against float64 thresholds, do the same
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self._leaf_values(X, self.roots).sum(axis=1) / self.n_trees
+
+    def _leaf_values(self, X, roots):
+        """(n, len(roots), n_classes) leaf distributions of the given trees for the float32 rows of X."""
+        n, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n) * n_features)[:, None]
+        nodes = np.repeat(roots[None, :], n, axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat.take(row_offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.children.take(nodes * 2 + go_right)
+        return self.value.take(nodes, axis=0)
+
+    def predict_proba_early_exit(self, X, class_thresholds, normal_index, chunk_size=25, margin=1e-9):
+        """predict_proba that stops adding trees once a row's thresholded verdict can no longer change.
+
+        The verdict is the one monitoring.apply_thresholds makes: the argmax class, or normal
+        when its probability is under class_thresholds. Trees are added in their fixed order and
+        rows are checked every chunk_size trees. Each remaining tree adds at most 1 to any class
+        vote, so a row is settled when
+          - some attack class leads every other class by more than the remaining trees and
+            is already over its threshold (it stays the argmax and stays over), or
+          - no attack class can still finish as the argmax at or above its threshold.
+        The remaining trees' votes of a settled row are then given to normal, which keeps
+        that verdict. Unsettled rows run through every tree and get exactly predict_proba's
+        result. Returns (probabilities, trees evaluated per row).
+
+        Every checkpoint costs an extra vectorized pass, so this only pays off on large batches.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n = len(X)
+        votes = np.zeros((n, self.n_classes))
+        trees_evaluated = np.full(n, self.n_trees)
+        limits = np.asarray(class_thresholds, dtype=np.float64) * self.n_trees
+        is_attack = np.arange(self.n_classes) != normal_index
+        active = np.arange(n)
+
+        # No row can settle before a class may hold a majority of the trees, or before the remaining
+        # trees can no longer lift an attack class from zero to its threshold; evaluate that much at once
+        first_check = max(1, min(self.n_trees // 2 + 1, int(self.n_trees - limits[is_attack].min()) + 1))
+        checkpoints = list(range(first_check, self.n_trees, chunk_size)) + [self.n_trees]
+
+        start = 0
+        for end in checkpoints:
+            leaf_values = self._leaf_values(X[active], self.roots[start:end])
+            # Summed after the votes so far, tree by tree: the same order (and rounding) as predict_proba
+            chunk_votes = np.concatenate([votes[active][:, None], leaf_values], axis=1).sum(axis=1)
+            votes[active] = chunk_votes
+            start = end
+
+            remaining = self.n_trees - end
+            if remaining == 0:
+                break
+
+            best = chunk_votes.argmax(axis=1)
+            top = chunk_votes.max(axis=1)
+            second = np.partition(chunk_votes, -2, axis=1)[:, -2]
+
+            attack_settled = (is_attack[best] & (top - second > remaining + margin)
+                              & (top >= limits[best] + margin))
+            # Best final vote any other class is sure to reach, seen from each class
+            others_best = np.where(np.arange(self.n_classes) == best[:, None], second[:, None], top[:, None])
+            upper = chunk_votes + remaining
+            cannot_win = (upper < limits - margin) | (upper < others_best - margin)
+            normal_settled = np.all(cannot_win | ~is_attack, axis=1)
+
+            settled = attack_settled | normal_settled
+            if settled.any():
+                settled_rows = active[settled]
+                votes[settled_rows, normal_index] += remaining
+                trees_evaluated[settled_rows] = end
+                active = active[~settled]
+                if len(active) == 0:
+                    break
+
+        return votes / self.n_trees, trees_evaluated
+
+    def save(self, path):
+        """Write the forest as path/<array>.npy plus path/meta.json, into a folder of its own.
+
+        Files another process may have memory-mapped are never overwritten (Windows refuses to
+        replace them), so a new compile always goes to a new folder; see load_or_compile().
+        """
+        os.makedirs(path)
+        for name in self.ARRAYS:
+            array = self.classes_ if name == "classes" else getattr(self, name)
+            np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(array))
+        # meta.json is written last, so it marks a complete save
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump({"max_depth": self.max_depth, "model_hash": self.model_hash}, file)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            meta = json.load(file)
+        return cls(arrays["feature"], arrays["threshold"], arrays["children"], arrays["value"],
+                   arrays["roots"], meta["max_depth"], arrays["classes"], meta.get("model_hash"))
+
+
+def compile_forest(model, model_hash=None):
+    """Flatten every tree of a fitted RandomForestClassifier into one node table."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes) + offset
+        is_leaf = tree.children_left == -1
+
+        # Leaves loop back to themselves
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, tree.threshold)
+
+        # Per-leaf class distribution, normalized the way DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    children = np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).ravel()
+    return CompiledForest(
+        np.concatenate(features).astype(np.intp),
+        np.concatenate(thresholds).astype(np.float64),
+        children.astype(np.intp),
+        np.ascontiguousarray(np.concatenate(values)),
+        np.array(roots, dtype=np.intp),
+        max_depth,
+        np.asarray(model.classes_),
+        model_hash,
+    )
+
+
+def current_version(compiled_path):
+    """Folder of the compiled forest in use, as named by compiled_path/current, or None."""
+    try:
+        with open(os.path.join(compiled_path, "current"), "r") as file:
+            version = os.path.join(compiled_path, file.read().strip())
+    except OSError:
+        return None
+    return version if os.path.exists(os.path.join(version, "meta.json")) else None
+
+
+def is_fresh(compiled_path, model_path):
+    """True if a complete compiled forest is in use and was switched to after the model file last changed."""
+    pointer = os.path.join(compiled_path, "current")
+    return (current_version(compiled_path) is not None
+            and os.path.getmtime(pointer) >= os.path.getmtime(model_path))
+
+
+def load_or_compile(model_path, compiled_path, load_model):
+    """Memory-map the compiled forest, recompiling it first if the model file is newer.
+
+    Each compile goes to compiled_path/<model hash> and compiled_path/current is then switched
+    to it, so a running monitor keeps its mapped arrays while the new ones are written.
+    load_model() is only called (and the pickle only unpickled) when a recompile is needed.
+    """
+    if not is_fresh(compiled_path, model_path):
+        model_hash = file_hash(model_path)
+        name = model_hash[:16]
+        version = os.path.join(compiled_path, name)
+        if not os.path.exists(os.path.join(version, "meta.json")):
+            if os.path.exists(version):
+                # Left incomplete (or half removed) earlier: leave it alone and use a fresh folder
+                name += f"-{os.getpid()}-{int(os.path.getmtime(model_path))}"
+                version = os.path.join(compiled_path, name)
+                shutil.rmtree(version, ignore_errors=True)
+            compile_forest(load_model(), model_hash).save(version)
+        _switch_version(compiled_path, name)
+    return CompiledForest.load(current_version(compiled_path))
+
+
+def _switch_version(compiled_path, name):
+    """Point compiled_path/current at the folder name, then remove older folders nobody should still map."""
+    pointer = os.path.join(compiled_path, "current")
+    try:
+        with open(pointer, "r") as file:
+            previous = file.read().strip()
+    except OSError:
+        previous = None
+    with open(pointer + ".tmp", "w") as file:
+        file.write(name)
+    os.replace(pointer + ".tmp", pointer)
+
+    # The previous folder stays: the running monitor maps it until it swaps. Older ones go, meta.json
+    # first so a folder still mapped somewhere (and so only partly removed) never counts as complete
+    for entry in os.listdir(compiled_path):
+        folder = os.path.join(compiled_path, entry)
+        if entry in (name, previous) or not os.path.isdir(folder):
+            continue
+        try:
+            os.remove(os.path.join(folder, "meta.json"))
+        except OSError:
+            pass
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    model_path = "models/rf_model_resampled.pkl"
+    compiled_path = "models/rf_model_resampled_compiled"
+    forest = load_or_compile(model_path, compiled_path, lambda: joblib.load(model_path))
+    print(f"Compiled {forest.n_trees} trees ({len(forest.feature)} nodes, depth {forest.max_depth}) to {compiled_path}")
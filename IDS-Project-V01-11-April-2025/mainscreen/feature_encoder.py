@@ -0,0 +1,86 @@
+import numpy as np
+
+# Categorical fields that training.py one-hot encoded with pd.get_dummies
+CATEGORICAL_COLUMNS = ("protocol_type", "service", "flag")
+
+
+class FeatureEncoder:
+    """Maps raw packet features straight to fixed column offsets of the model input.
+
+    Built once from encoded_columns; encoding writes into a preallocated NumPy
+    row (or matrix) instead of going through pd.DataFrame/pd.get_dummies.
+    Rows are float32 by default, the type every forest backend compares in, so
+    they reach the model without another conversion.
+    """
+
+    def __init__(self, encoded_columns, dtype=np.float32):
+        self.columns = list(encoded_columns)
+        self.n_features = len(self.columns)
+        self.dtype = dtype
+
+        # Numeric column name -> offset
+        self.numeric_index = {}
+        # Categorical field -> {category value as str -> offset}
+        self.onehot_index = {name: {} for name in CATEGORICAL_COLUMNS}
+
+        for offset, column in enumerate(self.columns):
+            for name in CATEGORICAL_COLUMNS:
+                prefix = name + "_"
+                if column.startswith(prefix):
+                    self.onehot_index[name][column[len(prefix):]] = offset
+                    break
+            else:
+                self.numeric_index[column] = offset
+
+        self._row = np.zeros((1, self.n_features), dtype=dtype)
+        self._row_touched = []
+
+    def encode_into(self, features, out, touched=None):
+        """Write one feature dict into the 1-D array `out`.
+
+        Without touched, out must be zeroed. touched is a list kept per reused row: the
+        offsets it holds from the previous call are zeroed first and replaced by the ones
+        written now, so a reused row never needs a full reset.
+        """
+        if touched is not None:
+            for offset in touched:
+                out[offset] = 0
+            touched.clear()
+        numeric_index = self.numeric_index
+        onehot_index = self.onehot_index
+        for name, value in features.items():
+            offset = numeric_index.get(name)
+            if offset is None:
+                slots = onehot_index.get(name)
+                if slots is None:
+                    continue
+                # pd.get_dummies names the dummy column f"{name}_{value}"
+                offset = slots.get(value if type(value) is str else str(value))
+                if offset is None:
+                    continue
+                value = 1
+            out[offset] = value
+            if touched is not None:
+                touched.append(offset)
+        return out
+
+    def encode(self, features):
+        """Encode a single feature dict into the shared (1, n_features) row.
+
+        The returned array is reused by the next call; copy it if it has to be kept.
+        """
+        row = self._row
+        self.encode_into(features, row[0], self._row_touched)
+        return row
+
+    def encode_batch(self, features_list, out=None):
+        """Encode a list of feature dicts into an (n, n_features) matrix."""
+        n = len(features_list)
+        if out is None:
+            out = np.zeros((n, self.n_features), dtype=self.dtype)
+        else:
+            out = out[:n]
+            out.fill(0)
+        for i, features in enumerate(features_list):
+            self.encode_into(features, out[i])
+        return out
@@ -0,0 +1,229 @@
+import sys
+from state_table import StateTable
+
+# KDD99 service names by the responder's port (or ICMP type), as the dataset spells them
+TCP_SERVICES = {
+    7: "echo", 9: "discard", 11: "systat", 13: "daytime", 15: "netstat", 20: "ftp_data", 21: "ftp", 22: "ssh",
+    23: "telnet", 25: "smtp", 37: "time", 42: "name", 43: "whois", 53: "domain", 57: "mtp", 70: "gopher",
+    71: "remote_job", 77: "rje", 79: "finger", 80: "http", 84: "ctf", 87: "link", 95: "supdup", 101: "hostnames",
+    102: "iso_tsap", 105: "csnet_ns", 109: "pop_2", 110: "pop_3", 111: "sunrpc", 113: "auth", 117: "uucp_path",
+    119: "nntp", 137: "netbios_ns", 138: "netbios_dgm", 139: "netbios_ssn", 143: "imap4", 150: "sql_net",
+    175: "vmnet", 179: "bgp", 194: "IRC", 210: "Z39_50", 389: "ldap", 433: "nnsp", 443: "http_443", 512: "exec",
+    513: "login", 514: "shell", 515: "printer", 520: "efs", 530: "courier", 540: "uucp", 543: "klogin",
+    544: "kshell", 2784: "http_2784", 5190: "aol", 8001: "http_8001",
+}
+TCP_SERVICES.update({port: "X11" for port in range(6000, 6064)})
+UDP_SERVICES = {53: "domain_u", 69: "tftp_u", 123: "ntp_u"}
+ICMP_SERVICES = {0: "ecr_i", 3: "urp_i", 5: "red_i", 8: "eco_i", 13: "tim_i", 14: "tim_i"}
+
+# Rough memory cost of one open connection (table slot, key tuple and addresses, Connection), for the stats
+CONNECTION_BYTES = 100 + sys.getsizeof((0,) * 5) + 2 * sys.getsizeof("255.255.255.255") + 8 * 20 + 60
+
+# TCP header flags
+FIN, SYN, RST, ACK, URG = 0x01, 0x02, 0x04, 0x10, 0x20
+
+# Connection.state bits: what each side has sent so far
+ORIG_SYN, RESP_SYN, ORIG_FIN, RESP_FIN, ORIG_RST, RESP_RST = 1, 2, 4, 8, 16, 32
+HANDSHAKE = ORIG_SYN | RESP_SYN
+
+
+def kdd_service(l4, port, icmp_type=0):
+    """KDD99 service name of a connection to port (ICMP: of its first message type)."""
+    if l4 == "tcp":
+        return TCP_SERVICES.get(port, "private")
+    if l4 == "udp":
+        return UDP_SERVICES.get(port, "private")
+    if l4 == "icmp":
+        return ICMP_SERVICES.get(icmp_type, "oth_i")
+    return "other"
+
+
+class Connection:
+    """Both directions of one 5-tuple; the originator is the side that sent the first packet."""
+
+    __slots__ = ("protocol", "l4", "src", "sport", "dst", "dport", "service", "start", "last",
+                 "src_bytes", "dst_bytes", "src_packets", "dst_packets", "urgent", "state", "closed", "due")
+
+    def __init__(self, header, t, reverse=False):
+        self.protocol = header.protocol
+        self.l4 = header.l4
+        if reverse:
+            self.src, self.sport, self.dst, self.dport = header.dst, header.dport, header.src, header.sport
+        else:
+            self.src, self.sport, self.dst, self.dport = header.src, header.sport, header.dst, header.dport
+        self.service = kdd_service(self.l4, self.dport, header.flags)
+        self.start = self.last = t
+        self.src_bytes = self.dst_bytes = 0  # payload bytes sent by the originator / the responder
+        self.src_packets = self.dst_packets = 0
+        self.urgent = 0
+        self.state = 0
+        self.closed = False
+        self.due = None  # deadline of its pending TimingWheel registration
+
+    def flag(self):
+        """KDD99 connection status (the Bro conn_state names) from what both sides sent."""
+        if self.l4 != "tcp":
+            return "SF"
+        state = self.state
+        if not state & ORIG_SYN:
+            if state & RESP_SYN:
+                if state & RESP_RST:
+                    return "RSTRH"
+                if state & RESP_FIN:
+                    return "SHR"
+            return "OTH"
+        if not state & RESP_SYN:
+            if state & RESP_RST:
+                return "REJ"
+            if state & ORIG_RST:
+                return "RSTOS0"
+            if state & ORIG_FIN:
+                return "SH"
+            return "S0"
+        if state & ORIG_RST:
+            return "RSTO"
+        if state & RESP_RST:
+            return "RSTR"
+        if state & ORIG_FIN and state & RESP_FIN:
+            return "SF"
+        if state & ORIG_FIN:
+            return "S2"
+        if state & RESP_FIN:
+            return "S3"
+        return "S1"
+
+
+class FlowTable:
+    """Groups packets into connections and hands each one on once, when it is over.
+
+    Packets of both directions of a (protocol, address, port, address, port) tuple go to one
+    Connection, keyed by the originator's direction. For TCP the SYN/FIN/RST seen from either
+    side give the KDD flag. A connection is over close_linger seconds after both FINs or a
+    RST (so the last ACKs still land in it), attempt_timeout seconds after an unanswered
+    handshake packet, or after idle_timeouts[l4] seconds without packets; on_record(connection, now)
+    is then called once. Timeouts run on the shared TimingWheel with one registration per
+    connection: later packets only push the deadline back, which expire() finds when it fires, and
+    a packet that brings the deadline forward (a handshake packet, a FIN or RST) replaces it.
+    ICMP messages are not grouped: each one is handed on at once as a record of its own, as in KDD.
+
+    Connections live in a StateTable bounded by max_connections / max_bytes. When it is full the
+    least recently active connection is handed on early, as it stands, so floods of one-packet
+    connections cost bounded memory and are still classified.
+    """
+
+    def __init__(self, wheel, on_record, idle_timeouts, attempt_timeout=5.0, close_linger=1.0,
+                 max_connections=None, max_bytes=None):
+        self.wheel = wheel
+        self.on_record = on_record
+        self.idle_timeouts = idle_timeouts
+        self.attempt_timeout = attempt_timeout
+        self.close_linger = close_linger
+        self.flows = StateTable(max_connections, max_bytes, CONNECTION_BYTES, 0, self._evicted)
+        self.packets = 0
+        self.records = 0
+        self.clock = 0.0  # time of the latest packet, for connections evicted while adding one
+
+    def add(self, header, t):
+        """Account one packet (a packet_parser.PacketHeader) to its connection."""
+        self.packets += 1
+        self.clock = t
+        if header.l4 == "icmp":
+            # KDD has one record per ICMP message (eco_i, ecr_i, ...), and a ping flood is classified as it happens
+            connection = Connection(header, t)
+            connection.src_bytes = header.payload_len
+            connection.src_packets = 1
+            self.records += 1
+            self.on_record(connection, t)
+            return connection
+        protocol, src, sport, dst, dport = header.protocol, header.src, header.sport, header.dst, header.dport
+        key = (protocol, src, sport, dst, dport)
+        connection = self.flows.get(key)
+        from_originator = True
+        state_changed = False
+        if connection is None:
+            reverse_key = (protocol, dst, dport, src, sport)
+            connection = self.flows.get(reverse_key)
+            if connection is not None:
+                from_originator = False
+                key = reverse_key
+            else:
+                # A SYN-ACK first means the SYN was missed: its receiver opened the connection
+                if header.l4 == "tcp" and header.flags & (SYN | ACK) == SYN | ACK:
+                    key, from_originator = reverse_key, False
+                connection = Connection(header, t, reverse=not from_originator)
+                self.flows.add(key, connection)
+                state_changed = True
+
+        connection.last = t
+        if from_originator:
+            connection.src_bytes += header.payload_len
+            connection.src_packets += 1
+        else:
+            connection.dst_bytes += header.payload_len
+            connection.dst_packets += 1
+        if connection.l4 == "tcp":
+            flags = header.flags
+            if flags & URG:
+                connection.urgent += 1
+            if flags & (SYN | FIN | RST):
+                state = connection.state
+                if flags & SYN:
+                    state |= ORIG_SYN if from_originator else RESP_SYN
+                if flags & FIN:
+                    state |= ORIG_FIN if from_originator else RESP_FIN
+                if flags & RST:
+                    state |= ORIG_RST if from_originator else RESP_RST
+                if state != connection.state:
+                    state_changed = True
+                    connection.state = state
+                    connection.closed = (bool(state & (ORIG_RST | RESP_RST))
+                                         or state & (ORIG_FIN | RESP_FIN) == ORIG_FIN | RESP_FIN)
+        if state_changed:
+            deadline = self.deadline(connection)
+            if connection.due is None or deadline < connection.due:
+                connection.due = deadline
+                self.wheel.schedule(deadline, self, key, t)
+        return connection
+
+    def deadline(self, connection):
+        """Time at which the connection counts as over if no further packet arrives."""
+        if connection.closed:
+            return connection.last + self.close_linger
+        if connection.l4 == "tcp" and connection.state & HANDSHAKE and connection.state & HANDSHAKE != HANDSHAKE:
+            return connection.last + self.attempt_timeout
+        return connection.last + self.idle_timeouts.get(connection.l4, self.idle_timeouts[None])
+
+    def expire(self, key, now):
+        """TimingWheel callback: emit the connection if it is over, otherwise check again at its new deadline."""
+        connection = self.flows.peek(key)
+        if connection is None:
+            return
+        deadline = self.deadline(connection)
+        if deadline > now:
+            connection.due = deadline
+            self.wheel.schedule(deadline, self, key, now)
+            return
+        self.flows.pop(key)
+        self.records += 1
+        self.on_record(connection, now)
+
+    def _evicted(self, key, connection):
+        self.wheel.cancel(self, key)
+        self.records += 1
+        self.on_record(connection, self.clock)
+        return 0
+
+    def flush(self, now):
+        """Emit every open connection, e.g. when monitoring stops."""
+        connections = list(self.flows.pairs())
+        self.flows.clear()
+        for key, connection in connections:
+            self.wheel.cancel(self, key)
+            self.records += 1
+            self.on_record(connection, now)
+
+    def stats(self):
+        return self.flows.stats()
+
+    def __len__(self):
+        return len(self.flows)
@@ -0,0 +1,106 @@
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from collections import Counter
+
+_listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread; drops them (and counts it) instead of blocking when it falls behind."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue stays in this process, so the record needs no pickling: leave msg and args for the
+        # writer thread to format instead of doing it here, on the capture or GUI thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: at exit the queue may be full and everything queued should still be written
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(level="INFO", queue_size=10000):
+    """Send the "ids" loggers through a bounded queue to a background writer thread.
+
+    Formatting and console output happen on that thread, so a slow console never stalls
+    capture or classification. Calling it again only changes the level.
+    """
+    global _listener
+    logger = logging.getLogger("ids")
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s [%(name)s] %(message)s"))
+    _listener = _Listener(log_queue, console)
+    _listener.start()
+    atexit.register(_listener.stop)  # write out what is still queued
+
+    logger.addHandler(_DroppingQueueHandler(log_queue))
+    logger.propagate = False
+    return logger
+
+
+def dropped_records():
+    """Records thrown away because the writer thread was behind."""
+    return sum(getattr(handler, "dropped", 0) for handler in logging.getLogger("ids").handlers)
+
+
+class PacketLogSampler:
+    """Decides which packets get a per-packet debug record: none, all, or 1 in every_n."""
+
+    def __init__(self, logger, every_n=0):
+        self.logger = logger
+        self.every_n = every_n
+        self.seen = 0
+
+    def should_log(self):
+        if self.every_n <= 0 or not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        self.seen += 1
+        return self.seen % self.every_n == 0
+
+
+class ClassSummary:
+    """Counts verdicts per class and logs one summary line every interval seconds."""
+
+    def __init__(self, logger, interval=10.0):
+        self.logger = logger
+        self.interval = interval
+        self.counts = Counter()
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def add(self, predicted_attacks):
+        self.counts.update(predicted_attacks)
+        self.batches += 1
+
+    def maybe_log(self):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        if self.interval <= 0 or elapsed < self.interval or not self.counts:
+            return False
+        total = sum(self.counts.values())
+        per_class = ", ".join(f"{label} {count}" for label, count in sorted(self.counts.items()))
+        self.logger.info("%d packets in %d batches over %.0f s (%.0f/s): %s; %d log records dropped",
+                         total, self.batches, elapsed, total / elapsed, per_class, dropped_records())
+        self.counts.clear()
+        self.batches = 0
+        self.started = now
+        return True
@@ -0,0 +1,148 @@
+import math
+import sys
+import time
+from state_table import StateTable
+
+# Rough memory cost of one destination's shed count (table slot, address string, count), for the stats
+DESTINATION_BYTES = 100 + sys.getsizeof("255.255.255.255")
+
+
+class LoadShedder:
+    """Decides which packets get classified when traffic arrives faster than we can handle it.
+
+    Every packet still goes through feature extraction, so the windowed counters stay exact;
+    only encoding, inference and per-packet reporting are skipped for shed packets. Sampling
+    is deterministic 1-in-N per destination, and a classified packet carries a weight equal
+    to the packets of its destination it stands for, so weighted verdict counts add up to
+    the real packet count.
+
+    N is recomputed every update_interval seconds from the measured arrival rate, the backlog
+    still queued from the sniffer, and the measured cost of a classified and of a shed packet.
+
+    The shed counts live in a StateTable bounded by max_destinations / max_bytes, as overload is
+    when destinations are most likely random or spoofed. An evicted destination's shed packets
+    are never folded into a verdict; they are counted in shed_uncounted.
+    """
+
+    def __init__(self, target_utilization=0.8, max_ratio=64, drain_seconds=5.0, update_interval=1.0,
+                 max_destinations=None, max_bytes=None):
+        self.target_utilization = target_utilization
+        self.max_ratio = max_ratio
+        self.drain_seconds = drain_seconds
+        self.update_interval = update_interval
+
+        self.ratio = 1
+        # destination -> packets shed since its last classified one
+        self.shed_since_kept = StateTable(max_destinations, max_bytes, DESTINATION_BYTES, 0, self._evicted)
+        self.shed_uncounted = 0
+
+        self.last_update = time.perf_counter()
+        self.last_arrived = 0
+        self.arrival_rate = 0.0
+        self.backlog = 0
+
+        # Busy time per handled packet, split by path (seconds)
+        self.full_cost = 0.0
+        self.shed_cost = 0.0
+        self.full_seconds = self.full_packets = 0.0
+        self.shed_seconds = self.shed_packets = 0.0
+
+        self.packets_shed = 0
+        self.overload_started = None
+        self.overload_seconds = 0.0  # total, including the current episode
+        self.overload_episodes = 0
+
+    def admit(self, destination):
+        """Weight to count this packet's verdict with, or 0 if it should not be classified."""
+        shed_since_kept = self.shed_since_kept
+        shed = shed_since_kept.get(destination)
+        if self.ratio > 1 and shed is not None and shed < self.ratio - 1:
+            shed_since_kept.set(destination, shed + 1)
+            self.packets_shed += 1
+            return 0
+        if self.ratio > 1:
+            if shed is None:
+                shed_since_kept.add(destination, 0)
+            else:
+                shed_since_kept.set(destination, 0)
+        elif shed is not None:
+            shed_since_kept.pop(destination)
+        return 1 + (shed or 0)
+
+    def _evicted(self, destination, shed):
+        self.shed_uncounted += shed
+        return 0
+
+    def record(self, classified, seconds, n=1):
+        """Add busy time spent on n packets (classified=True also covers their share of batch work)."""
+        if classified:
+            self.full_seconds += seconds
+            self.full_packets += n
+        else:
+            self.shed_seconds += seconds
+            self.shed_packets += n
+
+    def maybe_update(self, arrived, received):
+        """Recompute the sampling ratio once per update_interval.
+
+        arrived is the sniffer's running packet count, received the number of packets the
+        controller has taken off the queue. Returns True when the ratio changed.
+        """
+        now = time.perf_counter()
+        elapsed = now - self.last_update
+        if elapsed < self.update_interval:
+            return False
+
+        self.arrival_rate = (arrived - self.last_arrived) / elapsed
+        self.backlog = max(0, arrived - received)
+        self.last_arrived = arrived
+        self.last_update = now
+        if self.full_packets:
+            self.full_cost = self.full_seconds / self.full_packets
+        if self.shed_packets:
+            self.shed_cost = self.shed_seconds / self.shed_packets
+        self.full_seconds = self.full_packets = self.shed_seconds = self.shed_packets = 0
+
+        previous = self.ratio
+        self.ratio = self._required_ratio()
+        if self.ratio > 1 and self.overload_started is None:
+            self.overload_started = now
+            self.overload_episodes += 1
+        elif self.ratio == 1 and self.overload_started is not None:
+            self.overload_seconds += now - self.overload_started
+            self.overload_started = None
+            # Keep shed counts that still have to be folded into a destination's next verdict
+            for destination in [d for d, n in self.shed_since_kept.pairs() if not n]:
+                self.shed_since_kept.pop(destination)
+        return self.ratio != previous
+
+    def _required_ratio(self):
+        # Packets per second we must get through: new arrivals plus draining the backlog
+        demand = self.arrival_rate + self.backlog / self.drain_seconds
+        if demand <= 0 or self.full_cost <= 0:
+            return 1
+        # With 1-in-N sampling a packet costs full_cost / N + shed_cost * (1 - 1 / N) on average
+        budget = self.target_utilization / demand
+        if self.full_cost <= budget:
+            return 1
+        if budget <= self.shed_cost:
+            return self.max_ratio
+        return min(self.max_ratio, math.ceil((self.full_cost - self.shed_cost) / (budget - self.shed_cost)))
+
+    def current_overload_seconds(self):
+        if self.overload_started is None:
+            return self.overload_seconds
+        return self.overload_seconds + time.perf_counter() - self.overload_started
+
+    def stats(self):
+        return {
+            "ratio": self.ratio,
+            "arrival_rate": self.arrival_rate,
+            "backlog": self.backlog,
+            "packets_shed": self.packets_shed,
+            "overload_seconds": self.current_overload_seconds(),
+            "overload_episodes": self.overload_episodes,
+            "destinations": len(self.shed_since_kept),
+            "destination_evictions": self.shed_since_kept.evictions,
+            "shed_uncounted": self.shed_uncounted,
+        }
@@ -27,6 +27,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.monitoring_controller = MonitoringController(self)
         self.monitoring_controller.alert_triggered.connect(self.handle_alert)
         self.monitoring_controller.status_updated.connect(self.update_status)
+        # Load the model and warm the detection path while the UI comes up
+        self.monitoring_controller.warm_up_async()
         
         # **🔹 Apply UI Setup**
         self.apply_font_size(self.load_font_size())
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import logging
+import numpy as np
+import joblib
+from feature_encoder import FeatureEncoder
+from compiled_forest import CompiledForest, load_or_compile, compile_forest
+from tree_codegen import load_or_generate, file_hash
+from cascade import Cascade
+from protocol_router import ProtocolRouter, indicator_columns
+
+logger = logging.getLogger("ids.model_handle")
+
+
+class ModelArtifacts:
+    """One complete, loaded artifact set: model, column list, label encoder and inference backend."""
+
+    def __init__(self, paths, backend="compiled", use_cascade=True, early_exit_min_rows=0, use_protocol_models=False):
+        started = time.perf_counter()
+        self.paths = paths
+        self._model = None
+        self.encoded_columns = joblib.load(paths["encoded_columns"])
+        self.label_encoder = joblib.load(paths["label_encoder"])
+        self.classes = self.label_encoder.classes_
+        self.normal_index = list(self.classes).index("normal") if "normal" in list(self.classes) else None
+        # Verdicts are decoded by indexing this instead of label_encoder.inverse_transform
+        self.class_names = np.array([str(label) for label in self.classes], dtype=object)
+        # Per-protocol forests from training.py --per-protocol take the place of the full forest
+        protocol_models = None
+        if use_protocol_models and os.path.exists(paths["protocol_models"]):
+            protocol_models = joblib.load(paths["protocol_models"])
+        # Column offsets are resolved once here, so no pandas work is done per packet. The router
+        # needs a column for every protocol it routes, appended after the model's own
+        columns = list(self.encoded_columns)
+        if protocol_models is not None:
+            columns += indicator_columns(columns, protocol_models)
+        self.encoder = FeatureEncoder(columns)
+
+        if backend == "compiled":
+            # Memory-mapped arrays; the pickled sklearn model is only unpickled if a recompile is needed
+            self.compiled_model = load_or_compile(paths["model"], paths["compiled"], lambda: self.model)
+        elif backend == "codegen":
+            # Likewise, the generated module is imported as is unless the model changed
+            self.compiled_model = load_or_generate(paths["model"], paths["codegen"], lambda: self.model)
+        else:
+            self.compiled_model = None
+
+        if protocol_models is not None:
+            self.router = ProtocolRouter(protocol_models, self.encoder, len(self.classes))
+        else:
+            self.router = None
+
+        # Early exit needs the compiled forest's tree-by-tree evaluation
+        self.early_exit = (early_exit_min_rows > 0 and isinstance(self.compiled_model, CompiledForest)
+                           and self.normal_index is not None and self.router is None)
+        self.early_exit_min_rows = early_exit_min_rows
+        self.trees_evaluated = 0
+        self.rows_evaluated = 0
+
+        model_hash = getattr(self.compiled_model, "model_hash", None) or file_hash(paths["model"])
+        self.version = model_hash[:12]
+
+        if use_cascade and os.path.exists(paths["gate"]):
+            gate = joblib.load(paths["gate"])
+            self.cascade = Cascade(compile_forest(gate["model"]), gate["threshold"], len(self.classes),
+                                   self.normal_index)
+        else:
+            self.cascade = None
+
+        self.load_seconds = time.perf_counter() - started
+
+    @property
+    def model(self):
+        """The pickled sklearn forest, unpickled on first use."""
+        if self._model is None:
+            self._model = joblib.load(self.paths["model"])
+        return self._model
+
+    def full_predict_proba(self, rows, class_thresholds=None):
+        """Full-model probabilities, from the per-protocol forests when they are loaded. Given the
+        per-class thresholds, batches of at least early_exit_min_rows stop evaluating trees once a
+        row's verdict is settled (see CompiledForest)."""
+        if self.router is not None:
+            return self.router.predict_proba(rows, self.forest_predict_proba)
+        if self.early_exit and class_thresholds is not None and len(rows) >= self.early_exit_min_rows:
+            probabilities, trees = self.compiled_model.predict_proba_early_exit(rows, class_thresholds,
+                                                                                self.normal_index)
+            self.trees_evaluated += int(trees.sum())
+            self.rows_evaluated += len(rows)
+            return probabilities
+        return self.forest_predict_proba(rows)
+
+    def forest_predict_proba(self, rows):
+        """Probabilities of the monolithic forest on the configured backend."""
+        if self.compiled_model is not None:
+            return self.compiled_model.predict_proba(rows)
+        # sklearn wants exactly its own columns, without the router's
+        return self.model.predict_proba(rows[:, :len(self.encoded_columns)])
+
+    def predict_proba(self, rows, class_thresholds=None):
+        if self.cascade is not None:
+            return self.cascade.predict_proba(rows, lambda flagged: self.full_predict_proba(flagged, class_thresholds))
+        return self.full_predict_proba(rows, class_thresholds)
+
+    def average_trees_evaluated(self):
+        return self.trees_evaluated / self.rows_evaluated if self.rows_evaluated else 0.0
+
+
+class ModelHandle:
+    """Holds the artifact set in use and swaps in retrained ones while monitoring runs.
+
+    A new set is loaded and checked against a canary batch on a background thread;
+    the classifier then calls swap_if_pending() between batches, so the swap itself
+    is a single reference assignment and capture never pauses.
+    """
+
+    def __init__(self, load_fn, watch_path, canary_features):
+        self.load_fn = load_fn
+        self.watch_path = watch_path
+        self.canary_features = canary_features
+
+        self.current = load_fn()
+        self.validate(self.current)
+        self.pending = None
+        self.loading = False
+        self.watched_mtime = self._mtime()
+
+        self.swaps = 0
+        self.last_swap_ms = 0.0
+        self.last_error = None
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.watch_path)
+        except OSError:
+            return None
+
+    def validate(self, artifacts):
+        """Run the canary batch through a freshly loaded artifact set; raises ValueError if it misbehaves."""
+        if "normal" not in list(artifacts.classes):
+            raise ValueError("label encoder has no 'normal' class")
+        probabilities = np.asarray(artifacts.predict_proba(artifacts.encoder.encode_batch(self.canary_features)))
+        expected_shape = (len(self.canary_features), len(artifacts.classes))
+        if probabilities.shape != expected_shape:
+            raise ValueError(f"canary output shape {probabilities.shape}, expected {expected_shape}")
+        if not np.all(np.isfinite(probabilities)) or not np.allclose(probabilities.sum(axis=1), 1.0):
+            raise ValueError("canary probabilities are not valid distributions")
+
+    def check_for_update(self):
+        """Start a background reload if the model file changed on disk. Cheap enough for a timer."""
+        mtime = self._mtime()
+        # The mtime only counts as seen once a load of it starts: a change made while another load
+        # is running is picked up by the first check after that load finishes
+        if mtime is not None and mtime != self.watched_mtime and self.reload_async():
+            self.watched_mtime = mtime
+
+    def reload_async(self):
+        if self.loading:
+            return False
+        self.loading = True
+        threading.Thread(target=self._load, daemon=True).start()
+        return True
+
+    def _load(self):
+        try:
+            artifacts = self.load_fn()
+            self.validate(artifacts)
+            self.pending = artifacts
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error("❌ Model reload rejected: %s", e)
+        finally:
+            self.loading = False
+
+    def swap_if_pending(self):
+        """Swap in a validated artifact set, if one is ready. Call only between batches."""
+        pending = self.pending
+        if pending is None:
+            return False
+        started = time.perf_counter()
+        self.current = pending
+        self.pending = None
+        self.last_swap_ms = (time.perf_counter() - started) * 1000.0
+        self.swaps += 1
+        return True
@@ -1,30 +1,201 @@
-from scapy.all import sniff, IP, TCP, UDP, ICMP
-import pandas as pd
-import joblib
+from scapy.all import sniff
 import sqlite3
-from collections import defaultdict
 import time
+import logging
 import numpy as np
 from datetime import datetime
-import json
-import os
+import warnings
 from PyQt5 import QtWidgets
+from verdict_cache import VerdictCache
+from model_handle import ModelArtifacts, ModelHandle
+from settings_service import ThresholdSettings
+from ids_logging import setup_logging, PacketLogSampler, ClassSummary
+from packet_parser import scapy_header
+from traffic_window import SlidingWindows, RecentConnections
+from timing_wheel import TimingWheel
+
+# Logging: LOG_LEVEL "INFO" shows startup messages, alerts and a summary line of verdicts per class
+# every LOG_SUMMARY_SECONDS. Per-packet records (features, prediction, probabilities) are only written
+# at LOG_LEVEL "DEBUG", for 1 in every PACKET_LOG_EVERY packets (0 = never, 1 = every packet).
+# Records are written by a background thread and dropped rather than slowing down capture.
+LOG_LEVEL = "INFO"
+PACKET_LOG_EVERY = 0
+LOG_SUMMARY_SECONDS = 10
+LOG_QUEUE_SIZE = 10000
+
+logger = setup_logging(LOG_LEVEL, LOG_QUEUE_SIZE).getChild("monitoring")
+packet_log = PacketLogSampler(logger, PACKET_LOG_EVERY)
+class_summary = ClassSummary(logger, LOG_SUMMARY_SECONDS)
+
+# Set to True to use the narrow model trained with "python training.py --reduced" on only
+# the features extract_features() computes ("--reduced --connection" for FEATURE_MODE = "connection")
+USE_REDUCED_MODEL = False
+MODEL_VARIANT = "reduced" if USE_REDUCED_MODEL else "resampled"
+
+MODEL_PATHS = {
+    "model": f"models/rf_model_{MODEL_VARIANT}.pkl",
+    "encoded_columns": f"models/encoded_columns_{MODEL_VARIANT}.pkl",
+    "label_encoder": f"models/label_encoder_{MODEL_VARIANT}.pkl",
+    "compiled": f"models/rf_model_{MODEL_VARIANT}_compiled",
+    "codegen": f"models/rf_model_{MODEL_VARIANT}_codegen.py",
+    "gate": f"models/gate_model_{MODEL_VARIANT}.pkl",
+    "protocol_models": f"models/protocol_models_{MODEL_VARIANT}.pkl",
+}
+
+# Inference backend used by classify():
+#   "sklearn"  - the pickled RandomForestClassifier's own predict_proba
+#   "compiled" - the same forest flattened into NumPy arrays (compiled_forest.py), much faster on batches
+#   "codegen"  - the forest generated as plain Python if/else code (tree_codegen.py), lowest latency
+#                when packets are classified one at a time (BATCH_SIZE = 1)
+MODEL_BACKEND = "compiled"
+
+# Early exit: with the "compiled" backend, stop adding trees for a packet once the remaining trees can
+# no longer change its verdict under the current sensitivity thresholds. Verdicts are identical to
+# evaluating every tree; only the confidence shown for such packets differs (the votes of the skipped
+# trees are counted as normal). Each check costs an extra pass over the batch, so it is only used for
+# batches of at least EARLY_EXIT_MIN_ROWS packets (0 = off); it pays off from a few hundred rows,
+# i.e. with a large BATCH_SIZE during floods (see benchmarks/bench_early_exit.py).
+EARLY_EXIT_MIN_ROWS = 0
+
+# Two-stage cascade: the small gate model trained by training.py answers "normal" on its own
+# and only the packets it flags go through the full forest. Used when the gate model file exists.
+USE_CASCADE = True
+
+# Per-protocol models: classify TCP, UDP and ICMP packets with the three smaller forests trained by
+# "python training.py --per-protocol" (each on its own columns) instead of the single forest.
+# Used when the protocol models file exists; packets of other protocols (GRE, ESP...) still go to the
+# single forest.
+USE_PROTOCOL_MODELS = False
+
+# How often (ms) the monitor checks whether the model file was replaced, e.g. by training.py or
+# prune_forest.py --export. A new model is loaded in the background, checked on CANARY_FEATURES
+# and swapped in between batches without stopping capture.
+MODEL_RELOAD_CHECK_MS = 5000
+CANARY_FEATURES = [
+    {"protocol_type": "tcp", "service": "http", "flag": 2, "src_bytes": 0, "dst_bytes": 0,
+     "count": 1, "srv_count": 1, "same_srv_rate": 1.0, "diff_srv_rate": 0.0},
+    {"protocol_type": "udp", "service": "dns", "flag": 0, "src_bytes": 40, "dst_bytes": 40,
+     "count": 5, "srv_count": 12, "same_srv_rate": 0.8, "diff_srv_rate": 0.2},
+    {"protocol_type": "icmp", "service": "other", "flag": 0, "src_bytes": 1024, "dst_bytes": 1024,
+     "count": 500, "srv_count": 500, "same_srv_rate": 1.0, "diff_srv_rate": 0.0},
+]
+
+def load_artifacts():
+    return ModelArtifacts(MODEL_PATHS, MODEL_BACKEND, USE_CASCADE, EARLY_EXIT_MIN_ROWS, USE_PROTOCOL_MODELS)
 
 # Load trained model and encoders
-model = joblib.load("models/rf_model_resampled.pkl")
-encoded_columns = joblib.load("models/encoded_columns_resampled.pkl")
-label_encoder = joblib.load("models/label_encoder_resampled.pkl")
+model_handle = ModelHandle(load_artifacts, MODEL_PATHS["model"], CANARY_FEATURES)
+
+# The model was fitted on a DataFrame; we now feed it plain NumPy rows in the same column order
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
-print("Class Order:", label_encoder.classes_)
+logger.info("Class order: %s", list(model_handle.current.classes))
+logger.info("Model version: %s", model_handle.current.version)
 
 
 # Set up SQLite database connection (fallback if no controller)
-connection = sqlite3.connect("IDS.db")
+# This module may be imported by the background warm-up thread, so allow use from the GUI thread
+connection = sqlite3.connect("IDS.db", check_same_thread=False)
 cursor = connection.cursor()
 
-# Sliding window for traffic-based features
+# Every time-windowed table below expires its old entries through one timing wheel, advanced
+# every WINDOW_TICK_MS by tick_windows(), which also reports how much memory each window holds
+WINDOW_TICK_MS = 1000
+window_wheel = TimingWheel(WINDOW_TICK_MS / 1000)
+
+# Hard bounds per table of detector state (each window below, the flow table and the load shedder's
+# per-destination counts), so a flood of spoofed sources or a scan of random destinations cannot exhaust
+# memory (state_table.py). Beyond STATE_MAX_KEYS keys or STATE_MAX_BYTES estimated bytes the least recently
+# used keys are evicted; an evicted destination starts counting from zero again. Evictions are counted and
+# reported with the window stats.
+STATE_MAX_KEYS = 100_000
+STATE_MAX_BYTES = 32 * 1024 * 1024
+
+# Sliding windows for the traffic-based features, as KDD defines them over the last traffic_window seconds:
+# count = packets to the same destination, srv_count = packets to the same service (any destination),
+# same_srv_rate / diff_srv_rate = share of the destination's packets to the same / another service.
+# In "connection" mode (below) they count connections instead of packets, as KDD does.
 traffic_window = 60  # seconds
-packet_history = defaultdict(list)
+# destination IP -> packet times in the window
+packet_history = SlidingWindows(traffic_window, window_wheel, STATE_MAX_KEYS, STATE_MAX_BYTES)
+# service -> packet times
+service_history = SlidingWindows(traffic_window, window_wheel, STATE_MAX_KEYS, STATE_MAX_BYTES)
+# (destination IP, service) -> packet times
+dst_service_history = SlidingWindows(traffic_window, window_wheel, STATE_MAX_KEYS, STATE_MAX_BYTES)
+
+# Host-based KDD features (dst_host_*) over the last HOST_WINDOW_CONNECTIONS connections to the same destination
+# host, and for the dst_host_srv_* ones to the same service; in "packet" mode each packet counts as a connection.
+# SYN errors are the connections with flag S0, S1, S2 or S3, rejections the ones with flag REJ.
+HOST_WINDOW_CONNECTIONS = 100
+# destination IP -> (service, source port)
+host_connections = RecentConnections(HOST_WINDOW_CONNECTIONS, 2, STATE_MAX_KEYS, STATE_MAX_BYTES)
+# service -> (destination IP,)
+service_connections = RecentConnections(HOST_WINDOW_CONNECTIONS, 1, STATE_MAX_KEYS, STATE_MAX_BYTES)
+SERROR_FLAGS = {"S0", "S1", "S2", "S3"}
+
+# What gets classified. "packet": every packet on its own, with features read from that packet alone.
+# "connection": packets are grouped into connections by flow_table.py (both directions of a 5-tuple) and
+# one KDD connection record is classified per connection once it is over, with duration, bytes per
+# direction, the KDD flag (SF, S0, REJ, ...) and KDD service names, like the records the model was
+# trained on. This classifies far fewer rows, but a verdict comes only once its connection has ended.
+# Load shedding is not used in this mode.
+FEATURE_MODE = "packet"
+# A connection is over after FLOW_IDLE_TIMEOUTS seconds without packets (by protocol, None for the others),
+# FLOW_ATTEMPT_TIMEOUT seconds after an unanswered TCP handshake packet, or FLOW_CLOSE_LINGER seconds after
+# its FIN/RST exchange. Timeouts are checked every WINDOW_TICK_MS. ICMP messages are records of their own,
+# classified as soon as they arrive.
+FLOW_IDLE_TIMEOUTS = {"tcp": 120, "udp": 60, None: 60}
+FLOW_ATTEMPT_TIMEOUT = 5
+FLOW_CLOSE_LINGER = 1
+
+PROTOCOL_NAMES = {1: "icmp", 6: "tcp", 17: "udp"}
+
+# Micro-batching of model calls: a batch is classified once it holds BATCH_SIZE packets
+# or its oldest packet has waited BATCH_MAX_DELAY_MS, whichever comes first.
+# Bigger values give more throughput, smaller values give lower latency.
+BATCH_SIZE = 64
+BATCH_MAX_DELAY_MS = 50
+
+# Worker-pool mode: run inference in this many separate processes (worker_pool.py) so it can use
+# more than one CPU core. Batches go to the workers through shared memory; alerts and database
+# logging still happen in the GUI process. 0 classifies in the GUI process as before.
+# The verdict cache below is not used in this mode.
+INFERENCE_WORKERS = 0
+
+# Load shedding: when packets arrive faster than they can be classified, only 1 in N packets per
+# destination is classified and its verdict is counted N times (feature windows still see every packet).
+# N is chosen to keep the monitor busy SHED_TARGET_UTILIZATION of the time and to clear any backlog
+# within SHED_DRAIN_SECONDS.
+LOAD_SHEDDING = True
+SHED_TARGET_UTILIZATION = 0.8
+SHED_MAX_RATIO = 64
+SHED_DRAIN_SECONDS = 5
+
+# Read IP/TCP/UDP/ICMP headers straight from the captured bytes (packet_parser.py) instead of having
+# scapy dissect every layer of every packet. Packets with IP options, fragments or other unusual
+# headers are still dissected by scapy; the features are the same either way
+# (benchmarks/bench_packet_parser.py checks this on a capture file).
+FAST_PACKET_PARSER = True
+
+# LRU cache of class probabilities per encoded feature vector (0 disables it).
+# Optionally bucket byte counts (e.g. 64 -> 0-63, 64-127, ...) and round rates to raise the hit rate;
+# this slightly changes what the model sees, so it is off by default.
+VERDICT_CACHE_SIZE = 4096
+VERDICT_CACHE_BYTE_BUCKET = 0
+VERDICT_CACHE_RATE_DECIMALS = None
+
+if VERDICT_CACHE_SIZE:
+    verdict_cache = VerdictCache(
+        VERDICT_CACHE_SIZE,
+        byte_columns=("src_bytes", "dst_bytes"),
+        byte_bucket=VERDICT_CACHE_BYTE_BUCKET,
+        rate_columns=("same_srv_rate", "diff_srv_rate", "dst_host_same_srv_rate", "dst_host_diff_srv_rate",
+                      "dst_host_same_src_port_rate", "dst_host_srv_diff_host_rate", "dst_host_serror_rate",
+                      "dst_host_srv_serror_rate", "dst_host_rerror_rate", "dst_host_srv_rerror_rate"),
+        rate_decimals=VERDICT_CACHE_RATE_DECIMALS
+    )
+else:
+    verdict_cache = None
 
 # Probability thresholds for classification
 THRESHOLD_LEVELS = {
@@ -35,39 +206,29 @@ THRESHOLD_LEVELS = {
 
 CONFIG_FILE = "config.txt"
 
-def load_sensitivity():
-    if not os.path.exists(CONFIG_FILE):
-        return "Medium"
-    try:
-        with open(CONFIG_FILE, "r") as file:
-            settings = json.load(file)
-            return settings.get("sensitivity", "Medium")
-    except (json.JSONDecodeError, FileNotFoundError):
-        return "Medium"
-
-def get_attack_thresholds():
-    return THRESHOLD_LEVELS.get(load_sensitivity(), THRESHOLD_LEVELS["Medium"])
+# Sensitivity follows config.txt while monitoring runs: the file is checked every
+# SETTINGS_CHECK_MS and a changed level takes effect from the next batch.
+SETTINGS_CHECK_MS = 1000
+threshold_settings = ThresholdSettings(CONFIG_FILE, THRESHOLD_LEVELS)
+logger.info("Loaded thresholds: %s", threshold_settings.thresholds)
 
-thresholds = get_attack_thresholds()
-print("Loaded Thresholds:", thresholds)
+# Attack detection: alert once the same feature vector was predicted as an attack
+# attack_threshold times within attack_window seconds
+attack_window = 60
+attack_threshold = 10
+# packet id -> attack verdict times
+attack_timestamps = SlidingWindows(attack_window, window_wheel, STATE_MAX_KEYS, STATE_MAX_BYTES)
 
-malicious_packet_count = defaultdict(int)
-attack_timestamps = defaultdict(list)
+def extract_features(header, current_time):
+    """Build the runtime feature dict for one IP packet and update the traffic windows.
 
-def process_packet(pkt, controller=None):
-    # Skip non-IP packets immediately
-    if not pkt.haslayer(IP):
-        return #"Non-IP packet (skipping)"
-    
-    current_time = time.time()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ip = pkt[IP]
-    
+    header is a packet_parser.PacketHeader (FrameParser.parse() or scapy_header()).
+    """
     # Initialize features with proper protocol detection
     features = {
-        "protocol_type": {1: "icmp", 6: "tcp", 17: "udp"}.get(ip.proto, "unknown"),
-        "src_bytes": len(ip.payload),
-        "dst_bytes": len(ip.payload),
+        "protocol_type": PROTOCOL_NAMES.get(header.protocol, "unknown"),
+        "src_bytes": header.payload_len,  # TCP/UDP/ICMP payload size, whole IP payload otherwise
+        "dst_bytes": header.payload_len,
         "service": "other",
         "flag": 0,  # Default for non-TCP
         "count": 0,
@@ -76,147 +237,207 @@ def process_packet(pkt, controller=None):
         "diff_srv_rate": 0.0,
     }
 
-    # If TCP, use the length of the payload (this should represent the data being sent)
-    if pkt.haslayer(TCP):
-        print("TCP Packet")
-        features["src_bytes"] = len(pkt[TCP].payload)  # Size of TCP payload
-        features["dst_bytes"] = len(pkt[TCP].payload)  # Size of TCP payload
-        tcp = pkt[TCP]
+    if header.l4 == "tcp":
         features.update({
-            "flag": int(tcp.flags),
-            "service": "http" if tcp.dport == 80 else ("https" if tcp.dport == 443 else "tcp")
+            "flag": header.flags,
+            "service": "http" if header.dport == 80 else ("https" if header.dport == 443 else "tcp")
         })
-
-    # If UDP, do the same for UDP packets
-    elif pkt.haslayer(UDP):
-        print("UDP Packet")
-        features["src_bytes"] = len(pkt[UDP].payload)  # Size of UDP payload
-        features["dst_bytes"] = len(pkt[UDP].payload)  # Size of UDP payload
-        udp = pkt[UDP]
+    elif header.l4 == "udp":
         features.update({
-            "service": "dns" if udp.dport == 53 else "udp"
+            "service": "dns" if header.dport == 53 else "udp"
         })
 
-    # For ICMP, the length of the payload (ICMP data) will be used
-    elif pkt.haslayer(ICMP):
-        print("ICMP Packet")
-        features["src_bytes"] = len(pkt[ICMP].payload)  # ICMP payload size
-        features["dst_bytes"] = len(pkt[ICMP].payload)  # ICMP payload size
-
-    # Get destination IP for traffic analysis
-    dst_ip = ip.dst
-        
-    
-    # Update traffic window statistics
-    packet_history[dst_ip].append(current_time)
-    
-    # Clean up old packets from history
-    for ip in list(packet_history.keys()):
-        packet_history[ip] = [t for t in packet_history[ip] if t > current_time - traffic_window]
-        if not packet_history[ip]:
-            del packet_history[ip]
-    
+    return add_traffic_features(features, header.dst, header.sport, current_time)
+
+def connection_features(connection, current_time):
+    """Build the KDD feature dict for one finished flow_table.Connection and update the traffic windows."""
+    features = {
+        "duration": connection.last - connection.start,
+        "protocol_type": PROTOCOL_NAMES.get(connection.protocol, "unknown"),
+        "service": connection.service,
+        "flag": connection.flag(),
+        "src_bytes": connection.src_bytes,
+        "dst_bytes": connection.dst_bytes,
+        "land": int(connection.src == connection.dst and connection.sport == connection.dport),
+        "urgent": connection.urgent,
+    }
+    return add_traffic_features(features, connection.dst, connection.sport, current_time)
+
+def add_traffic_features(features, dst_ip, src_port, current_time):
+    """Count this packet (or connection) into the traffic windows and fill in the windowed features."""
+    service = features["service"]
+    flag = features["flag"]
+
+    # Update traffic window statistics; only the touched keys' expired entries are dropped.
+    # Every count includes this one, so current_count is at least 1
+    current_count = packet_history.add(dst_ip, current_time)
+    same_service_count = dst_service_history.add((dst_ip, service), current_time)
+
     # Calculate traffic-based features
-    current_count = len(packet_history.get(dst_ip, []))
     features.update({
         "count": current_count,
-        "srv_count": sum(1 for t in packet_history.get(dst_ip, []) 
-                     if pkt.haslayer(TCP) and pkt[TCP].dport == features.get('service', 0)),
+        "srv_count": service_history.add(service, current_time),
+        "same_srv_rate": same_service_count / current_count,
+        "diff_srv_rate": (current_count - same_service_count) / current_count,
     })
-    
-    # Calculate service rates
-    if current_count > 0:
-        features["same_srv_rate"] = features["srv_count"] / current_count
-        features["diff_srv_rate"] = (current_count - features["srv_count"]) / current_count
 
-    try:
-        # Create DataFrame for model input
-        df = pd.DataFrame([features])
-        
-        # Ensure all required columns exist
-        required_columns = ["protocol_type", "service", "flag", "src_bytes", "dst_bytes", 
-                          "count", "srv_count", "same_srv_rate", "diff_srv_rate"]
-        for col in required_columns:
-            if col not in df.columns:
-                df[col] = 0
-        
-        # One-hot encoding
-        df_encoded = pd.get_dummies(df, columns=["protocol_type", "service", "flag"], drop_first=False)
-        
-        # Add missing columns with 0 values
-        missing_columns = {col: [0] * len(df_encoded) for col in encoded_columns if col not in df_encoded.columns}
-        df_encoded = pd.concat([df_encoded, pd.DataFrame(missing_columns)], axis=1)
-        df_encoded = df_encoded[encoded_columns]
-        
-        if df_encoded.empty:
-            return
+    # Host-based features over the last connections; each ring includes this one, so none is empty
+    serror = flag in SERROR_FLAGS
+    rerror = flag == "REJ"
+    host_count, (host_same_service, host_same_port), host_serrors, host_rerrors = host_connections.add(
+        dst_ip, (service, src_port), serror, rerror)
+    service_total, (service_same_host,), service_serrors, service_rerrors = service_connections.add(
+        service, (dst_ip,), serror, rerror)
+    features.update({
+        "dst_host_count": host_count,
+        "dst_host_srv_count": service_total,
+        "dst_host_same_srv_rate": host_same_service / host_count,
+        "dst_host_diff_srv_rate": (host_count - host_same_service) / host_count,
+        "dst_host_same_src_port_rate": host_same_port / host_count,
+        "dst_host_srv_diff_host_rate": (service_total - service_same_host) / service_total,
+        "dst_host_serror_rate": host_serrors / host_count,
+        "dst_host_srv_serror_rate": service_serrors / service_total,
+        "dst_host_rerror_rate": host_rerrors / host_count,
+        "dst_host_srv_rerror_rate": service_rerrors / service_total,
+    })
 
-        #Predict label
-        probabilities = model.predict_proba(df_encoded)
-        prediction_index = np.argmax(probabilities, axis=1)[0]
-        predicted_attack = label_encoder.inverse_transform([prediction_index])[0]
-        max_prob = probabilities[0][prediction_index]
+    return features
+
+WINDOWS = {"traffic": packet_history, "services": service_history, "destination services": dst_service_history,
+           "host connections": host_connections, "service connections": service_connections,
+           "attacks": attack_timestamps}
+
+def window_stats():
+    """Keys, entries, estimated memory and evictions of every window (see StateTable.stats())."""
+    return {name: window.stats() for name, window in WINDOWS.items()}
+
+def tick_windows():
+    """Timer: expire the window entries that are due and report what each window holds."""
+    expired = window_wheel.advance(time.time())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Windows after expiring %d keys: %s; timing wheel %d keys / %.1f MB", expired, ", ".join(
+            f"{name} {stats['keys']} keys / {stats['entries']} entries / {stats['bytes'] / 1e6:.1f} MB"
+            f" / {stats['evictions']} evicted ({stats['pressure_evictions']} over the byte cap)"
+            for name, stats in window_stats().items()), window_wheel.scheduled, window_wheel.memory_bytes() / 1e6)
+    return expired
 
-        # Apply thresholding
-        if max_prob < thresholds.get(predicted_attack, 0.1):
-            predicted_attack = "normal"
+def refresh_thresholds():
+    """Batch boundary: pick up a sensitivity change from the settings page."""
+    if threshold_settings.apply_if_pending():
+        logger.info("Loaded thresholds: %s", threshold_settings.thresholds)
 
+def classify(rows):
+    """Run the model over a (n, n_features) matrix of encoded rows."""
+    refresh_thresholds()
+    artifacts = model_handle.current
+    # Early exit settles verdicts against these thresholds
+    class_thresholds = threshold_settings.vector(artifacts.classes) if artifacts.early_exit else None
+    if verdict_cache is None:
+        return artifacts.predict_proba(rows, class_thresholds)
+    # Cached verdicts are only valid for the model and thresholds they were computed with
+    verdict_cache.validate((artifacts.version, threshold_settings.version), artifacts.encoder.numeric_index)
+    return verdict_cache.predict_proba(rows, lambda misses: artifacts.predict_proba(misses, class_thresholds))
+
+def apply_thresholds(probabilities):
+    """Vectorized argmax + sensitivity thresholding, returns (predicted_attacks, max_probs)."""
+    refresh_thresholds()
+    artifacts = model_handle.current
+    prediction_indices = np.argmax(probabilities, axis=1)
+    max_probs = probabilities[np.arange(len(prediction_indices)), prediction_indices]
+    class_thresholds = threshold_settings.vector(artifacts.classes)
+    verdicts = np.where(max_probs < class_thresholds[prediction_indices], artifacts.normal_index, prediction_indices)
+    predicted_attacks = artifacts.class_names[verdicts].tolist()
+    return predicted_attacks, max_probs
+
+def process_predictions(packets, probabilities, controller=None):
+    """Threshold, count and log a batch of classified packets.
+
+    packets is a list of (features, timestamp, current_time, weight) tuples aligned with the
+    rows of probabilities, weight being the number of packets a verdict stands for while load
+    shedding. Returns a list of (predicted_attack, packet_info).
+    """
+    # Thresholding for the whole batch at once
+    predicted_attacks, max_probs = apply_thresholds(probabilities)
+
+    results = []
+    alerts = []
+    for (features, timestamp, current_time, weight), predicted_attack, max_prob, packet_probs in zip(
+            packets, predicted_attacks, max_probs, probabilities):
         # Prepare output
         packet_info = f"Packet Captured:\nFeatures: protocol_type={features['protocol_type']}, " \
                      f"src_bytes={features['src_bytes']}, dst_bytes={features['dst_bytes']}, " \
                      f"service={features['service']}\n" \
                      f"Prediction: {predicted_attack} (Confidence: {max_prob:.2f})"
-        
-        print(f"\n[{timestamp}] Packet: {features}")
-        print(f"Prediction: {predicted_attack}")
-        probs_dict = {label: float(prob) for label, prob in zip(label_encoder.classes_, probabilities[0])}
-        print("Prediction Probabilities:")
-        for label, prob in probs_dict.items():
-            print(f"  {label:6}: {prob:.4f}")
 
+        if packet_log.should_log():
+            logger.debug("[%s] Packet: %s -> %s, probabilities: %s", timestamp, features, predicted_attack,
+                         ", ".join(f"{label} {prob:.4f}" for label, prob in zip(model_handle.current.classes, packet_probs)))
 
         if controller:
             controller.status_updated.emit(packet_info)
 
-        # Attack detection logic
-        attack_window = 60
-        attack_threshold = 10
         packet_id = hash(str(features))
 
         if predicted_attack not in ["normal", "unknown"]:
-            attack_timestamps[packet_id].append(current_time)
-            attack_timestamps[packet_id] = [t for t in attack_timestamps[packet_id] if t > current_time - attack_window]
-            malicious_packet_count[packet_id] = len(attack_timestamps[packet_id])
-
-            if malicious_packet_count[packet_id] >= attack_threshold:
-                print(f"🚨 ALERT TRIGGERED! Attack: {predicted_attack}")  # Debug
-                print(f"Controller exists: {controller is not None}")  # Debug
-                malicious_packet_count[packet_id] = 0
-
-                preventions = []
-                if controller:
-                    print("Calling controller.alert_triggered.emit()")  # Debug
-                    preventions = controller.get_preventions(predicted_attack)
-                    controller.log_attack((
-                        timestamp, features["protocol_type"], features["src_bytes"], features["dst_bytes"],
-                        features["service"], features["flag"], features["count"], features["srv_count"],
-                        features["same_srv_rate"], features["diff_srv_rate"], predicted_attack
-                    ))
-                    controller.alert_triggered.emit(predicted_attack, preventions)
-                else:
-                    cursor.execute("SELECT preventions FROM suggestions WHERE attack = ?", (predicted_attack,))
-                    preventions = cursor.fetchall()
-                    cursor.execute("""
-                    INSERT INTO detected_attacks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (timestamp, features["protocol_type"], features["src_bytes"], features["dst_bytes"],
-                           features["service"], features["flag"], features["count"], features["srv_count"],
-                           features["same_srv_rate"], features["diff_srv_rate"], predicted_attack))
-                    connection.commit()
+            malicious_packet_count = attack_timestamps.add(packet_id, current_time, weight)
+
+            if malicious_packet_count >= attack_threshold:
+                logger.warning("🚨 ALERT TRIGGERED! Attack: %s", predicted_attack)
+                alerts.append((
+                    timestamp, features["protocol_type"], features["src_bytes"], features["dst_bytes"],
+                    features["service"], features["flag"], features["count"], features["srv_count"],
+                    features["same_srv_rate"], features["diff_srv_rate"], predicted_attack
+                ))
+
+        results.append((predicted_attack, packet_info))
+
+    class_summary.add(predicted_attacks)
+    class_summary.maybe_log()
+
+    # DB logging for the whole batch in a single transaction
+    if alerts:
+        if controller:
+            controller.log_attacks(alerts)
+        else:
+            cursor.executemany("""
+            INSERT INTO detected_attacks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, alerts)
+            connection.commit()
+
+        if controller:
+            preventions_cache = {}
+            for alert in alerts:
+                predicted_attack = alert[-1]
+                if predicted_attack not in preventions_cache:
+                    preventions_cache[predicted_attack] = controller.get_preventions(predicted_attack)
+                controller.alert_triggered.emit(predicted_attack, preventions_cache[predicted_attack])
+
+    return results
+
+def process_packet(pkt, controller=None):
+    # Skip non-IP packets immediately
+    header = scapy_header(pkt)
+    if header is None:
+        return #"Non-IP packet (skipping)"
+
+    current_time = time.time()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    features = extract_features(header, current_time)
+
+    # Every packet is its own batch here, so a reloaded model can be swapped in right away
+    model_handle.swap_if_pending()
+
+    try:
+        # Encode features straight into the model's column layout
+        row = model_handle.current.encoder.encode(features)
+
+        #Predict label
+        probabilities = classify(row)
+        predicted_attack, packet_info = process_predictions([(features, timestamp, current_time, 1)], probabilities, controller)[0]
         return packet_info
 
     except Exception as e:
-        print(f"❌ Error processing packet: {e}")
+        logger.error("❌ Error processing packet: %s", e)
         if controller:
             controller.status_updated.emit(f"Error: {str(e)}")
         return f"Error: {str(e)}"
-
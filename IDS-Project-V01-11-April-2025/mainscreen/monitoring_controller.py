@@ -1,6 +1,14 @@
-from PyQt5.QtCore import QObject, pyqtSignal, QThread
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QTimer
 import sqlite3
-from scapy.all import sniff, IP, TCP, UDP, conf
+import logging
+import threading
+import time
+from datetime import datetime
+from scapy.all import sniff, IP, TCP, UDP, Raw, conf
+from packet_parser import FrameParser, scapy_header
+
+# Handlers and level are set up by monitoring.py (ids_logging.setup_logging)
+logger = logging.getLogger("ids.controller")
 
 # Set promiscuous mode on
 conf.promisc = True  # Enable promiscuous mode
@@ -9,6 +17,9 @@ class MonitoringController(QObject):
     status_updated = pyqtSignal(str)
     alert_triggered = pyqtSignal(str, list)  # attack_type, preventions
     data_updated = pyqtSignal(int, int)  # (normal_count, attack_count)
+    batch_processed = pyqtSignal(int, float, float)  # (batch_size, wait_ms, inference_ms)
+    model_swapped = pyqtSignal(str, float)  # (model_version, swap_ms)
+    load_shedding_changed = pyqtSignal(int, int, float)  # (sampling 1-in-N, packets_shed, overload_seconds)
     
     def __init__(self, main_page):
         super().__init__()
@@ -17,6 +28,19 @@ class MonitoringController(QObject):
         self.is_running = False
         self.normal_count = 0
         self.attack_count = 0
+        self.batcher = None
+        self.pool = None
+        self.shedder = None
+        self.flow_table = None  # set in "connection" feature mode
+        self.packets_received = 0
+        self.frame_parser = None  # set by MonitoringThread once the capture socket is open
+        self.batch_timer = None
+        self.reload_timer = None
+        self.settings_timer = None
+        self.window_timer = None
+        self.engine = None  # the monitoring module, imported by warm_up()
+        self.warmup_lock = threading.Lock()
+        self.warmup_report = []
         self.db_connection = sqlite3.connect("IDS.db")
         self._init_db()
         
@@ -43,8 +67,120 @@ class MonitoringController(QObject):
         )""")
         self.db_connection.commit()
         
+    def warm_up(self):
+        """Run every lazy initialization step now and time each one, so the first real packet hits a hot path.
+
+        Safe to call from a background thread at app start; start_monitoring() calls it
+        again and simply waits if the background warm-up is still running.
+        """
+        with self.warmup_lock:
+            if self.engine is not None:
+                return self.warmup_report
+            report = []
+
+            started = time.perf_counter()
+            import monitoring  # also loads the model artifacts
+            load_seconds = monitoring.model_handle.current.load_seconds
+            report.append(("import engine", (time.perf_counter() - started - load_seconds) * 1000))
+            report.append(("load model artifacts", load_seconds * 1000))
+
+            started = time.perf_counter()
+            artifacts = monitoring.model_handle.current
+            rows = artifacts.encoder.encode_batch(monitoring.CANARY_FEATURES)
+            report.append(("encode dummy batch", (time.perf_counter() - started) * 1000))
+
+            # Straight through the model and gate, so the cascade and verdict cache stats stay clean
+            started = time.perf_counter()
+            probabilities = artifacts.full_predict_proba(rows)
+            if artifacts.cascade is not None:
+                artifacts.cascade.gate_model.predict_proba(rows)
+            monitoring.apply_thresholds(probabilities)
+            report.append(("classify dummy batch", (time.perf_counter() - started) * 1000))
+
+            started = time.perf_counter()
+            pkt = IP(bytes(IP(dst="127.0.0.1") / TCP(dport=80) / b"warm-up"))
+            pkt.haslayer(UDP)  # walks every layer
+            FrameParser(IP).parse_bytes(bytes(pkt))
+            report.append(("packet dissection", (time.perf_counter() - started) * 1000))
+
+            self.warmup_report = report
+            self.engine = monitoring
+        summary = ", ".join(f"{step} {ms:.0f} ms" for step, ms in report)
+        logger.info("Warm-up: %s", summary)
+        self.status_updated.emit(f"Detection engine ready ({summary})")
+        return report
+
+    def warm_up_async(self):
+        """Start the warm-up in the background, e.g. while the main window is shown."""
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
     def start_monitoring(self):
         if not self.is_running:
+            self.warm_up()
+            monitoring = self.engine
+            from batching import MicroBatcher
+
+            artifacts = monitoring.model_handle.current
+            if monitoring.INFERENCE_WORKERS > 0:
+                from worker_pool import InferencePool
+                self.pool = InferencePool(
+                    monitoring.MODEL_PATHS, monitoring.MODEL_BACKEND, monitoring.USE_CASCADE,
+                    monitoring.INFERENCE_WORKERS, artifacts.encoder.n_features, len(artifacts.classes),
+                    self.process_batch,
+                    max_batch_size=monitoring.BATCH_SIZE,
+                    fallback_fn=monitoring.classify,
+                    use_protocol_models=monitoring.USE_PROTOCOL_MODELS
+                )
+
+            self.batcher = MicroBatcher(
+                artifacts.encoder.n_features,
+                None if self.pool is not None else monitoring.classify,
+                self.submit_batch if self.pool is not None else self.process_batch,
+                max_batch_size=monitoring.BATCH_SIZE,
+                max_delay_ms=monitoring.BATCH_MAX_DELAY_MS
+            )
+            # Flush partial batches on time when traffic is slow
+            self.batch_timer = QTimer(self)
+            self.batch_timer.timeout.connect(self.poll_batches)
+            self.batch_timer.start(max(1, monitoring.BATCH_MAX_DELAY_MS // 2))
+
+            if monitoring.FEATURE_MODE == "connection":
+                from flow_table import FlowTable
+                # Connections are timed out on the traffic windows' wheel, from the window timer below
+                self.flow_table = FlowTable(
+                    monitoring.window_wheel, self.process_connection, monitoring.FLOW_IDLE_TIMEOUTS,
+                    attempt_timeout=monitoring.FLOW_ATTEMPT_TIMEOUT,
+                    close_linger=monitoring.FLOW_CLOSE_LINGER,
+                    max_connections=monitoring.STATE_MAX_KEYS,
+                    max_bytes=monitoring.STATE_MAX_BYTES
+                )
+            elif monitoring.LOAD_SHEDDING:
+                from load_shedding import LoadShedder
+                self.shedder = LoadShedder(
+                    target_utilization=monitoring.SHED_TARGET_UTILIZATION,
+                    max_ratio=monitoring.SHED_MAX_RATIO,
+                    drain_seconds=monitoring.SHED_DRAIN_SECONDS,
+                    max_destinations=monitoring.STATE_MAX_KEYS,
+                    max_bytes=monitoring.STATE_MAX_BYTES
+                )
+            self.packets_received = 0
+            self.frame_parser = None
+
+            # Pick up retrained models without restarting
+            self.reload_timer = QTimer(self)
+            self.reload_timer.timeout.connect(monitoring.model_handle.check_for_update)
+            self.reload_timer.start(monitoring.MODEL_RELOAD_CHECK_MS)
+
+            # Pick up sensitivity changes from the settings page
+            self.settings_timer = QTimer(self)
+            self.settings_timer.timeout.connect(monitoring.threshold_settings.check_for_update)
+            self.settings_timer.start(monitoring.SETTINGS_CHECK_MS)
+
+            # Expire traffic and attack windows outside the packet path
+            self.window_timer = QTimer(self)
+            self.window_timer.timeout.connect(monitoring.tick_windows)
+            self.window_timer.start(monitoring.WINDOW_TICK_MS)
+
             self.thread = MonitoringThread(self)
             self.thread.packet_processed.connect(self.process_packet)
             self.thread.start()
@@ -56,29 +192,175 @@ class MonitoringController(QObject):
             self.thread.stop()
             self.thread.wait()
             self.thread = None
+            self.batch_timer.stop()
+            self.batch_timer = None
+            self.reload_timer.stop()
+            self.reload_timer = None
+            self.settings_timer.stop()
+            self.settings_timer = None
+            self.window_timer.stop()
+            self.window_timer = None
+            if self.flow_table is not None:
+                self.flow_table.flush(time.time())  # classify the connections still open
+                self.flow_table = None
+            self.batcher.flush()
+            if self.pool is not None:
+                self.pool.close()  # delivers the batches still in flight
+                self.pool = None
+            self.batcher = None
             self.is_running = False
             self.status_updated.emit("Monitoring Stopping!")
             
     def process_packet(self, pkt):
-        print(f"[Controller] Received packet type: {type(pkt)}")
-        from monitoring import process_packet
-    
-        result = process_packet(pkt, self)
-    
-         # Update counts based on classification
-        if result is not None and "Prediction: normal " in result:
-            self.normal_count += 1
-        elif result is not None and "Prediction: unknown" in result:
-            pass  # Don't count unknown packets
-        else:  # Any other classification counts as attack
-            self.attack_count += 1
-            print(f"Non-normal result: {result}")  # Debug
-    
-        # Emit updated counts after processing each packet
+        # packet_processed signals queued before stop_monitoring() still arrive after the batcher is gone
+        if not self.is_running:
+            return
+        started = time.perf_counter()
+        self.packets_received += 1
+
+        # Raw frames from the sniffer are parsed from their bytes, anything else through scapy's layers
+        parser = self.frame_parser
+        header = parser.parse(pkt) if parser is not None else scapy_header(pkt)
+        # Skip non-IP packets immediately
+        if header is None:
+            return
+
+        current_time = time.time()
+        # Connection mode: the packet only updates its connection, which is classified once it is over
+        if self.flow_table is not None:
+            self.flow_table.add(header, current_time)
+            return
+
+        # Always extract, so the traffic window counters stay exact even while shedding
+        features = self.engine.extract_features(header, current_time)
+        self.classify_features(features, header.dst, current_time, started)
+
+    def process_connection(self, connection, current_time):
+        """FlowTable callback: classify one finished connection."""
+        if not self.is_running:
+            return
+        features = self.engine.connection_features(connection, current_time)
+        self.classify_features(features, connection.dst, current_time, time.perf_counter())
+
+    def classify_features(self, features, destination, current_time, started):
+        """Queue one feature dict (a packet's or a connection's) for the next batch."""
+        model_handle = self.engine.model_handle
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        weight = 1
+        if self.shedder is not None:
+            self.update_load_shedding()
+            weight = self.shedder.admit(destination)
+            if weight == 0:
+                self.shedder.record(False, time.perf_counter() - started)
+                return
+
+        # Between batches: swap in a reloaded model if one is ready (workers follow the version they are sent)
+        if len(self.batcher) == 0 and model_handle.swap_if_pending():
+            self.batcher.resize(model_handle.current.encoder.n_features)
+            self.model_swapped.emit(model_handle.current.version, model_handle.last_swap_ms)
+            self.status_updated.emit(f"Model updated to version {model_handle.current.version} "
+                                     f"(loaded in {model_handle.current.load_seconds:.1f} s, "
+                                     f"swapped in {model_handle.last_swap_ms:.3f} ms)")
+
+        self.batcher.add(model_handle.current.encoder, features, (features, timestamp, current_time, weight))
+        if self.shedder is not None:
+            self.shedder.record(True, time.perf_counter() - started)
+
+    def update_load_shedding(self):
+        """Retune the sampling ratio from the sniffer's arrival count and our backlog."""
+        arrived = self.thread.packets_seen if self.thread is not None else self.packets_received
+        if not self.shedder.maybe_update(arrived, self.packets_received):
+            return
+        stats = self.shedder.stats()
+        self.load_shedding_changed.emit(stats["ratio"], stats["packets_shed"], stats["overload_seconds"])
+        if stats["ratio"] > 1:
+            self.status_updated.emit(f"Overload: {stats['arrival_rate']:,.0f} packets/s, backlog {stats['backlog']}. "
+                                     f"Classifying 1 in {stats['ratio']} packets per destination "
+                                     f"({stats['packets_shed']} shed so far)")
+        else:
+            self.status_updated.emit(f"Overload over after {stats['overload_seconds']:.1f} s in total, "
+                                     f"classifying every packet again ({stats['packets_shed']} shed)")
+
+    def poll_batches(self):
+        self.batcher.poll()
+        if self.pool is not None:
+            self.pool.collect()
+
+    def submit_batch(self, packets, rows):
+        """Worker-pool mode: send a flushed batch to the inference processes."""
+        artifacts = self.engine.model_handle.current
+        self.pool.submit(rows, packets, artifacts.version, len(artifacts.classes), self.batcher.last_wait_ms)
+
+    def process_batch(self, packets, probabilities):
+        started = time.perf_counter()
+        try:
+            results = self.engine.process_predictions(packets, probabilities, self)
+        except Exception as e:
+            logger.error("❌ Error processing batch: %s", e)
+            self.status_updated.emit(f"Error: {str(e)}")
+            return
+
+        # Update counts based on classification; while shedding, a verdict stands for `weight` packets
+        for (predicted_attack, packet_info), packet in zip(results, packets):
+            weight = packet[3]
+            if predicted_attack == "normal":
+                self.normal_count += weight
+            elif predicted_attack == "unknown":
+                pass  # Don't count unknown packets
+            else:  # Any other classification counts as attack
+                self.attack_count += weight
+
+            self.status_updated.emit(packet_info)
+
+        # Emit updated counts once per batch
         self.data_updated.emit(self.normal_count, self.attack_count)
-    
-        if result:  # Ensure result isn't None
-            self.status_updated.emit(result)
+        stats = self.pool if self.pool is not None else self.batcher
+        self.batch_processed.emit(stats.last_batch_size, stats.last_wait_ms, stats.last_inference_ms)
+        # Per-batch engine stats are debug output; skip building them when nobody reads them
+        if logger.isEnabledFor(logging.DEBUG):
+            self.log_batch_stats(stats)
+        if self.shedder is not None:
+            self.shedder.record(True, time.perf_counter() - started, 0)
+
+    def log_batch_stats(self, stats):
+        logger.debug("Batch of %d packets (waited %.1f ms, inference %.1f ms)",
+                     stats.last_batch_size, stats.last_wait_ms, stats.last_inference_ms)
+        if self.pool is not None:
+            logger.debug("Workers: %s", ", ".join(f"#{w['worker']} {w['rows']} rows ({w['rows_per_s']:,.0f} rows/s)"
+                                                  for w in self.pool.worker_stats()))
+        artifacts = self.engine.model_handle.current
+        if artifacts.early_exit:
+            logger.debug("Early exit: %.1f of %d trees per packet on average",
+                         artifacts.average_trees_evaluated(), artifacts.compiled_model.n_trees)
+        router = artifacts.router
+        if router is not None:
+            logger.debug("Protocol models: %s; %d packets of other protocols sent to the full model",
+                         ", ".join(f"{protocol} {rows}" for protocol, rows in router.rows.items()), router.fallback_rows)
+        cascade = artifacts.cascade
+        if cascade is not None:
+            logger.debug("Cascade gate short-circuited %d of %d packets (%.0f%%)",
+                         cascade.short_circuited, cascade.packets, cascade.short_circuit_rate() * 100)
+        if self.engine.verdict_cache is not None:
+            cache = self.engine.verdict_cache.stats()
+            logger.debug("Verdict cache: %d hits, %d misses (%.0f%%), %d evictions, %d invalidations",
+                         cache["hits"], cache["misses"], cache["hit_rate"] * 100, cache["evictions"],
+                         cache["invalidations"])
+        if self.flow_table is not None:
+            flows = self.flow_table.stats()
+            logger.debug("Flow table: %d packets grouped into %d finished connections, %d open "
+                         "(%.1f MB, %d handed on early to stay within the caps)",
+                         self.flow_table.packets, self.flow_table.records, flows["keys"], flows["bytes"] / 1e6,
+                         flows["evictions"])
+        if self.frame_parser is not None:
+            logger.debug("Packet parser: %.0f%% of packets read from raw bytes, %d dissected by scapy",
+                         self.frame_parser.fast_share() * 100, self.frame_parser.fallback)
+        if self.shedder is not None:
+            shedding = self.shedder.stats()
+            logger.debug("Load shedding: 1 in %d, %d shed, %.1f s in overload, %d destinations tracked "
+                         "(%d evicted, %d shed packets left out of the weights)",
+                         shedding["ratio"], shedding["packets_shed"], shedding["overload_seconds"],
+                         shedding["destinations"], shedding["destination_evictions"], shedding["shed_uncounted"])
 
     def log_attack(self, attack_data):
         cursor = self.db_connection.cursor()
@@ -86,6 +368,13 @@ class MonitoringController(QObject):
         INSERT INTO detected_attacks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, attack_data)
         self.db_connection.commit()
+
+    def log_attacks(self, attack_rows):
+        cursor = self.db_connection.cursor()
+        cursor.executemany("""
+        INSERT INTO detected_attacks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, attack_rows)
+        self.db_connection.commit()
         
     def get_preventions(self, attack_type):
         cursor = self.db_connection.cursor()
@@ -103,20 +392,39 @@ class MonitoringThread(QThread):   #Threading for running monitoring process
         super().__init__()
         self.controller = controller
         self.sniffer = None
+        self.packets_seen = 0  # arrivals, compared with the controller's count to measure the backlog
+
+    def on_packet(self, pkt):
+        # Undissected frames have no IP layer to check; the capture filter only lets IP through
+        if type(pkt) is Raw or pkt.haslayer(IP):
+            self.packets_seen += 1
+            self.packet_processed.emit(pkt)
 
     def run(self):
+        capture_socket = None
         try:
             # SIMPLE version - just capture on default interface
-            self.sniffer = AsyncSniffer(
-                prn=lambda pkt: pkt.haslayer(IP) and self.packet_processed.emit(pkt),
-                store=0,
+            capture_socket = conf.L2listen(
                 filter="ip or tcp or icmp",  # Only capture these packets
                 iface= "Intel(R) Dual Band Wireless-AC 7260"   # Specify the network interface
             )
+            if self.controller.engine.FAST_PACKET_PARSER:
+                # Have the socket hand over frames as Raw bytes instead of dissecting every layer;
+                # the parser falls back to the original link-layer class for unusual packets
+                self.controller.frame_parser = FrameParser(capture_socket.LL)
+                capture_socket.LL = Raw
+            self.sniffer = AsyncSniffer(
+                opened_socket=capture_socket,
+                prn=self.on_packet,
+                store=0
+            )
             self.sniffer.start()
             self.sniffer.join()
         except Exception as e:
-            print(f"Capture error: {e}")
+            logger.error("Capture error: %s", e)
+        finally:
+            if capture_socket is not None:
+                capture_socket.close()
 
     def stop(self):
         if self.sniffer:
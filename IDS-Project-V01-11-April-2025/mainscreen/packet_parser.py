@@ -0,0 +1,129 @@
+import socket
+import struct
+from collections import namedtuple
+from scapy.all import IP, TCP, UDP, ICMP, Raw
+
+# What extract_features needs from a packet. l4 follows the haslayer(TCP) / haslayer(UDP) /
+# haslayer(ICMP) order the feature code always used; payload_len is that layer's payload
+# length, or the IP payload length when l4 is None. Like scapy's len(layer.payload), lengths run
+# to the end of the captured frame, so Ethernet padding of short frames is counted.
+# flags holds the TCP flags, or the message type for ICMP.
+PacketHeader = namedtuple("PacketHeader", [
+    "protocol", "src", "dst", "l4", "sport", "dport", "flags", "ip_payload_len", "payload_len"
+])
+
+# Bytes before the IP header, by the class scapy would dissect the frame with
+LINK_OFFSETS = {"Ether": 14, "CookedLinux": 16, "CookedLinuxV2": 20, "Loopback": 4, "IP": 0}
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = 0x8100
+
+_ipv4_header = struct.Struct("!BBHHHBBH4s4s")
+_ports = struct.Struct("!HH")
+_udp_length = struct.Struct("!H")
+
+
+def scapy_header(pkt):
+    """PacketHeader from a dissected scapy packet, or None if it has no IP layer."""
+    if not pkt.haslayer(IP):
+        return None
+    ip = pkt[IP]
+    if pkt.haslayer(TCP):
+        layer = pkt[TCP]
+        return PacketHeader(ip.proto, ip.src, ip.dst, "tcp", layer.sport, layer.dport, int(layer.flags),
+                            len(ip.payload), len(layer.payload))
+    if pkt.haslayer(UDP):
+        layer = pkt[UDP]
+        return PacketHeader(ip.proto, ip.src, ip.dst, "udp", layer.sport, layer.dport, 0,
+                            len(ip.payload), len(layer.payload))
+    if pkt.haslayer(ICMP):
+        layer = pkt[ICMP]
+        return PacketHeader(ip.proto, ip.src, ip.dst, "icmp", 0, 0, layer.type, len(ip.payload), len(layer.payload))
+    return PacketHeader(ip.proto, ip.src, ip.dst, None, 0, 0, 0, len(ip.payload), len(ip.payload))
+
+
+def parse_ipv4(data, offset=0):
+    """PacketHeader straight from the bytes of an IPv4 packet starting at offset.
+
+    Only the plain cases are handled: no IP options, no fragments, a complete TCP/UDP/ICMP
+    echo header. Returns None for anything else, where scapy's answer should be used.
+    """
+    if len(data) < offset + 20:
+        return None
+    (version_ihl, _, total_length, _, fragment, _, protocol, _, src, dst) = _ipv4_header.unpack_from(data, offset)
+    # 0x45: IPv4 without options; any fragment bit or offset (except DF) goes to scapy
+    if version_ihl != 0x45 or fragment & 0x3FFF or total_length < 20 or len(data) < offset + total_length:
+        return None
+    l4 = offset + 20
+    ip_payload_len = len(data) - l4
+
+    if protocol == 6:
+        if total_length < 40:
+            return None
+        data_offset = (data[l4 + 12] >> 4) * 4
+        if data_offset < 20 or data_offset > total_length - 20:
+            return None
+        sport, dport = _ports.unpack_from(data, l4)
+        flags = ((data[l4 + 12] & 0x01) << 8) | data[l4 + 13]  # the NS bit is part of scapy's flags
+        return PacketHeader(6, socket.inet_ntoa(src), socket.inet_ntoa(dst), "tcp", sport, dport, flags,
+                            ip_payload_len, ip_payload_len - data_offset)
+    if protocol == 17:
+        if total_length < 28:
+            return None
+        sport, dport = _ports.unpack_from(data, l4)
+        (udp_length,) = _udp_length.unpack_from(data, l4 + 4)
+        if udp_length < 8:
+            return None
+        return PacketHeader(17, socket.inet_ntoa(src), socket.inet_ntoa(dst), "udp", sport, dport, 0,
+                            ip_payload_len, ip_payload_len - 8)
+    if protocol == 1:
+        # Echo request/reply only; error messages carry inner headers that scapy dissects too
+        if total_length < 28 or data[l4] not in (0, 8):
+            return None
+        return PacketHeader(1, socket.inet_ntoa(src), socket.inet_ntoa(dst), "icmp", 0, 0, data[l4],
+                            ip_payload_len, ip_payload_len - 8)
+    return None
+
+
+class FrameParser:
+    """Turns captured frames into PacketHeaders, reading raw bytes where it can.
+
+    link_layer is the scapy class the capture socket would normally dissect frames with.
+    Frames arriving as Raw (see MonitoringThread) are parsed with parse_ipv4 at the link
+    layer's fixed offset; unusual ones are dissected with link_layer after all. Already
+    dissected scapy packets are read through their layers.
+    """
+
+    def __init__(self, link_layer):
+        self.link_layer = link_layer
+        self.offset = LINK_OFFSETS.get(link_layer.__name__)
+        self.is_ethernet = link_layer.__name__ == "Ether"
+        self.fast = 0
+        self.fallback = 0
+
+    def parse_bytes(self, data):
+        offset = self.offset
+        header = None
+        if offset is not None and len(data) > offset:
+            if self.is_ethernet:
+                ethertype = (data[12] << 8) | data[13]
+                if ethertype == ETHERTYPE_VLAN and len(data) > 18:
+                    ethertype = (data[16] << 8) | data[17]
+                    offset = 18
+                if ethertype == ETHERTYPE_IPV4:
+                    header = parse_ipv4(data, offset)
+            elif data[offset] >> 4 == 4:
+                header = parse_ipv4(data, offset)
+        if header is not None:
+            self.fast += 1
+            return header
+        self.fallback += 1
+        return scapy_header(self.link_layer(data))
+
+    def parse(self, pkt):
+        if type(pkt) is Raw:
+            return self.parse_bytes(pkt.load)
+        return scapy_header(pkt)
+
+    def fast_share(self):
+        total = self.fast + self.fallback
+        return self.fast / total if total else 0.0
@@ -0,0 +1,57 @@
+import numpy as np
+from compiled_forest import compile_forest
+
+
+def indicator_columns(encoded_columns, protocols):
+    """protocol_type columns the router needs on top of the model's encoded_columns.
+
+    pd.get_dummies(drop_first=True) leaves one protocol (icmp) without a column, so its rows
+    look like those of any protocol the model never saw (GRE, ESP...). The router's encoder
+    gets the missing column appended; every forest only reads its own columns, so the extra
+    column changes nothing for them.
+    """
+    return [f"protocol_type_{protocol}" for protocol in protocols
+            if f"protocol_type_{protocol}" not in encoded_columns]
+
+
+class ProtocolRouter:
+    """One smaller forest per protocol_type, each on its own column subset.
+
+    models is what training.py --per-protocol saves: {protocol: {"model": forest, "columns": [...]}}.
+    Rows are routed by their protocol_type one-hot columns, which encoder must have for every
+    protocol (see indicator_columns()). Each forest's classes_ are label-encoder indices,
+    usually a subset of all classes, and are spread back into the full class layout.
+    Rows of any other protocol go to the fallback (the monolithic forest).
+    """
+
+    def __init__(self, models, encoder, n_classes):
+        self.n_classes = n_classes
+        self.routes = []  # (protocol, one-hot offset, compiled forest, column offsets, class indices)
+        protocol_slots = encoder.onehot_index["protocol_type"]
+        for protocol, entry in models.items():
+            if protocol not in protocol_slots:
+                raise ValueError(f"encoder has no protocol_type_{protocol} column to route on")
+            columns = np.array([encoder.columns.index(column) for column in entry["columns"]], dtype=np.intp)
+            forest = compile_forest(entry["model"])
+            self.routes.append((protocol, protocol_slots[protocol], forest, columns,
+                                np.asarray(forest.classes_, dtype=np.intp)))
+        self.rows = {protocol: 0 for protocol, *_ in self.routes}
+        self.fallback_rows = 0
+
+    def predict_proba(self, rows, fallback):
+        probabilities = np.zeros((len(rows), self.n_classes))
+        unrouted = np.ones(len(rows), dtype=bool)
+        for protocol, slot, forest, columns, classes in self.routes:
+            selected = np.flatnonzero(unrouted & (rows[:, slot] == 1))
+            if len(selected) == 0:
+                continue
+            unrouted[selected] = False
+            probabilities[selected[:, None], classes] = forest.predict_proba(rows[np.ix_(selected, columns)])
+            self.rows[protocol] += len(selected)
+        if unrouted.any():
+            probabilities[unrouted] = fallback(rows[unrouted])
+            self.fallback_rows += int(unrouted.sum())
+        return probabilities
+
+    def node_counts(self):
+        return {protocol: len(forest.feature) for protocol, _, forest, *_ in self.routes}
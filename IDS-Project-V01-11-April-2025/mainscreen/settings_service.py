@@ -0,0 +1,76 @@
+import os
+import json
+import numpy as np
+
+
+class ThresholdSettings:
+    """Sensitivity thresholds that follow config.txt while monitoring runs.
+
+    check_for_update() only stats the file, so it can run on a timer; the file is read
+    when its mtime changes and the new level is applied by apply_if_pending() at the next
+    batch boundary, never in the middle of a batch. vector(classes) gives the thresholds as
+    a NumPy array aligned with the label encoder's classes, rebuilt only after a change.
+    """
+
+    def __init__(self, config_file, levels, default_level="Medium", default_threshold=0.1):
+        self.config_file = config_file
+        self.levels = levels
+        self.default_level = default_level
+        self.default_threshold = default_threshold
+
+        self.sensitivity = self.load_sensitivity()
+        self.thresholds = self.levels.get(self.sensitivity, self.levels[default_level])
+        self.pending = None
+        self.version = 0  # bumped on every applied change
+        self.watched_mtime = self._mtime()
+
+        self._vector = None
+        self._vector_key = None
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.config_file)
+        except OSError:
+            return None
+
+    def load_sensitivity(self):
+        if not os.path.exists(self.config_file):
+            return self.default_level
+        try:
+            with open(self.config_file, "r") as file:
+                settings = json.load(file)
+                return settings.get("sensitivity", self.default_level)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return self.default_level
+
+    def check_for_update(self):
+        """Queue the new sensitivity level if config.txt changed on disk. Cheap enough for a timer."""
+        mtime = self._mtime()
+        if mtime == self.watched_mtime:
+            return False
+        self.watched_mtime = mtime
+        sensitivity = self.load_sensitivity()
+        if sensitivity == self.sensitivity:
+            # Changed back before a batch applied the queued level: drop it
+            self.pending = None
+            return False
+        self.pending = sensitivity
+        return True
+
+    def apply_if_pending(self):
+        """Switch to a queued sensitivity level. Call only between batches."""
+        sensitivity = self.pending
+        if sensitivity is None:
+            return False
+        self.pending = None
+        self.sensitivity = sensitivity
+        self.thresholds = self.levels.get(sensitivity, self.levels[self.default_level])
+        self.version += 1
+        return True
+
+    def vector(self, classes):
+        """Per-class thresholds as an array aligned with classes."""
+        if self._vector_key is None or self._vector_key[0] is not classes or self._vector_key[1] != self.version:
+            self._vector = np.array([self.thresholds.get(label, self.default_threshold) for label in classes])
+            self._vector_key = (classes, self.version)
+        return self._vector
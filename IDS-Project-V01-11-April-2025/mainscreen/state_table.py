@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+
+class StateTable:
+    """Per-key detector state with a hard cap on keys and on estimated memory.
+
+    The traffic windows, connection rings and the flow table keep their per-key state here
+    instead of in a plain dict, so a flood of spoofed sources or a scan of random destinations
+    cannot grow it without bound. Memory is estimated as key_bytes per key plus entry_bytes
+    per entry (timestamps, connection summaries...), with the owner reporting entries as they
+    come and go through grow() and shrink().
+
+    Once a cap is passed, keys are evicted from the front: the least recently used one with
+    policy="lru" (get() moves a key to the back), the oldest one with policy="fifo". The
+    owner's on_evict(key, value) drops whatever else refers to the key (e.g. its timing-wheel
+    registration) and returns the number of entries the value held. Evictions are counted,
+    separately for the key cap and the byte cap (memory pressure).
+    """
+
+    def __init__(self, max_keys=None, max_bytes=None, key_bytes=0, entry_bytes=0, on_evict=None, policy="lru"):
+        if policy not in ("lru", "fifo"):
+            raise ValueError(f"unknown eviction policy {policy!r}")
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self.key_bytes = key_bytes
+        self.entry_bytes = entry_bytes
+        self.on_evict = on_evict
+        self.lru = policy == "lru"
+        self.items = OrderedDict()
+        self.entries = 0
+        self.evictions = 0  # keys evicted, for either cap
+        self.evicted_entries = 0
+        self.pressure_evictions = 0  # keys evicted because of max_bytes
+        self.peak_bytes = 0
+
+    def get(self, key):
+        """The key's state, or None. Counts as a use of the key for LRU eviction."""
+        value = self.items.get(key)
+        if value is not None and self.lru:
+            self.items.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        """The key's state, or None, without counting as a use (e.g. when expiring it)."""
+        return self.items.get(key)
+
+    def add(self, key, value, entries=0):
+        """Store a new key, then evict older keys until both caps hold again."""
+        self.items[key] = value
+        self.entries += entries
+        if self.max_keys is not None:
+            while len(self.items) > self.max_keys:
+                self._evict_oldest()
+        self._check_bytes()
+
+    def grow(self, entries=1):
+        """An existing key took on more entries; evict older keys if that passes max_bytes."""
+        self.entries += entries
+        self._check_bytes()
+
+    def shrink(self, entries=1):
+        self.entries -= entries
+
+    def set(self, key, value):
+        """Replace the state of a key already stored, in place (not counted as a use)."""
+        self.items[key] = value
+
+    def pop(self, key):
+        """Remove a key the owner is done with (not counted as an eviction); the owner shrinks its entries."""
+        return self.items.pop(key, None)
+
+    def over_bytes(self):
+        """Still past max_bytes, which after add() or grow() means the newest key alone is."""
+        return self.max_bytes is not None and self.memory_bytes() > self.max_bytes
+
+    def _check_bytes(self):
+        bytes_used = len(self.items) * self.key_bytes + self.entries * self.entry_bytes
+        if self.max_bytes is not None:
+            # The key just added or grown is at the back and is kept, even when it alone passes the cap
+            while bytes_used > self.max_bytes and len(self.items) > 1:
+                self._evict_oldest()
+                self.pressure_evictions += 1
+                bytes_used = len(self.items) * self.key_bytes + self.entries * self.entry_bytes
+        if bytes_used > self.peak_bytes:
+            self.peak_bytes = bytes_used
+
+    def _evict_oldest(self):
+        key, value = self.items.popitem(last=False)
+        freed = self.on_evict(key, value) if self.on_evict is not None else 0
+        self.entries -= freed
+        self.evicted_entries += freed
+        self.evictions += 1
+
+    def memory_bytes(self):
+        return len(self.items) * self.key_bytes + self.entries * self.entry_bytes
+
+    def stats(self):
+        return {
+            "keys": len(self.items),
+            "entries": self.entries,
+            "bytes": self.memory_bytes(),
+            "peak_bytes": self.peak_bytes,
+            "evictions": self.evictions,
+            "evicted_entries": self.evicted_entries,
+            "pressure_evictions": self.pressure_evictions,
+        }
+
+    def values(self):
+        return self.items.values()
+
+    def pairs(self):
+        """(key, state) of every key, oldest first. Named so it does not clash with the entries count."""
+        return self.items.items()
+
+    def clear(self):
+        self.items.clear()
+        self.entries = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,111 @@
+import math
+import sys
+
+# Rough memory cost of one registration (bucket and location dict slots, their key tuples), for the per-tick report
+REGISTRATION_BYTES = 2 * (100 + sys.getsizeof((None, None)))
+
+
+class TimingWheel:
+    """Hierarchical timing wheel that tells windowed structures when their entries expire.
+
+    schedule(t, owner, key, now) asks for owner.expire(key, now) to be called once the clock
+    passes t; advance(now), called on a timer tick, makes those calls. Level 0 has `slots`
+    buckets of tick_seconds each and every higher level spans `slots` times the one below.
+    A deadline goes into the lowest level that reaches it and moves one level down each
+    time its bucket comes up, so a tick only touches the buckets that are due: its cost
+    follows the number of expiring entries, never the number of live ones.
+
+    The wheel holds at most one registration per (owner, key): scheduling again replaces it,
+    and cancel() removes it, e.g. when a bounded state table evicts the key. Owners register
+    the next deadline from expire(), so the wheel never holds more than their live keys.
+    """
+
+    def __init__(self, tick_seconds=1.0, slots=256, levels=3):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.spans = [slots ** level for level in range(levels)]  # ticks per bucket, per level
+        # Bucket: {(owner, key): tick}
+        self.buckets = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.where = {}  # (owner, key) -> the bucket holding its registration
+        self.current = None  # last tick processed
+
+    @property
+    def scheduled(self):
+        return len(self.where)
+
+    def schedule(self, t, owner, key, now):
+        """Register a deadline t; now (the caller's current time) starts the wheel's clock on first use."""
+        tick = math.ceil(t / self.tick_seconds)
+        if self.current is None:
+            self.current = math.floor(now / self.tick_seconds)
+        registration = (owner, key)
+        bucket = self.where.get(registration)
+        if bucket is not None:
+            self._remove(bucket, registration)
+        self._insert(registration, tick)
+
+    def cancel(self, owner, key):
+        bucket = self.where.pop((owner, key), None)
+        if bucket is not None:
+            self._remove(bucket, (owner, key))
+
+    @staticmethod
+    def _remove(bucket, registration):
+        del bucket[registration]
+        if not bucket:
+            # A dict keeps its grown table when emptied; after a flood of evicted keys that is megabytes per bucket
+            bucket.clear()
+
+    def _insert(self, registration, tick, earliest=None):
+        # Already due: fire on the next tick (or the one being processed, when cascading)
+        tick = max(tick, self.current + 1 if earliest is None else earliest)
+        for level, span in enumerate(self.spans):
+            if tick // span - self.current // span < self.slots:
+                bucket = self.buckets[level][tick // span % self.slots]
+                break
+        else:
+            # Further out than the top level reaches: park it in the top level's last bucket and re-file it from there
+            span = self.spans[-1]
+            bucket = self.buckets[-1][(self.current // span + self.slots - 1) % self.slots]
+        bucket[registration] = tick
+        self.where[registration] = bucket
+
+    def advance(self, now):
+        """Fire every deadline up to now. Returns the number of owner.expire() calls."""
+        target = math.floor(now / self.tick_seconds)
+        if self.current is None or not self.where:
+            # Nothing to fire, skip the idle ticks
+            if self.current is None or target > self.current:
+                self.current = target
+            return 0
+
+        fired = 0
+        while self.current < target:
+            self.current += 1
+            # Higher levels first, so their entries can drop all the way into the bucket due now
+            for level in range(len(self.spans) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current % span == 0:
+                    index = self.current // span % self.slots
+                    entries = self.buckets[level][index]
+                    self.buckets[level][index] = {}
+                    for registration, tick in entries.items():
+                        self._insert(registration, tick, self.current)
+
+            index = self.current % self.slots
+            due = self.buckets[0][index]
+            if not due:
+                continue
+            self.buckets[0][index] = {}
+            where = self.where
+            for registration in due:
+                del where[registration]
+            # expire() may register the key again, into a bucket that is not this one any more
+            for owner, key in due:
+                owner.expire(key, now)
+            fired += len(due)
+        return fired
+
+    def memory_bytes(self):
+        """Estimated memory held by the registrations."""
+        return len(self.where) * REGISTRATION_BYTES
@@ -0,0 +1,186 @@
+import sys
+from collections import deque
+from state_table import StateTable
+
+# Rough memory cost of the pieces a window is made of, for the per-tick report
+KEY_BYTES = 100 + sys.getsizeof(deque())  # dict slot, key object and an empty deque
+ENTRY_BYTES = 8 + sys.getsizeof(0.0)  # deque slot and float timestamp
+RING_BYTES = KEY_BYTES + 300  # plus the ring object and its tally dicts
+SUMMARY_BYTES = 8 + sys.getsizeof((0, 0, 0)) + 100  # deque slot, summary tuple and tally entries
+
+
+class SlidingWindows:
+    """Per-key timestamps of the last window_seconds, e.g. packets per destination IP for "count".
+
+    Each key's timestamps sit in a deque in arrival order, so the expired ones are always at
+    the front. add() only trims the key it touches, popping just the expired entries, and
+    returns that key's count. Every other key is expired by the shared TimingWheel: a key
+    holds one registration, for its oldest timestamp, and expire() drops what is due, then
+    registers the next deadline or forgets the key once it is empty. Nothing is rebuilt or
+    scanned per packet or per tick, so the cost does not grow with the number of live entries.
+
+    The keys live in a StateTable bounded by max_keys / max_bytes; beyond those the least
+    recently used keys are evicted and start from zero if they come back. A single key that
+    passes max_bytes on its own loses its oldest timestamps instead, so its count saturates.
+    """
+
+    def __init__(self, window_seconds, wheel, max_keys=None, max_bytes=None):
+        self.window = window_seconds
+        self.wheel = wheel
+        self.history = StateTable(max_keys, max_bytes, KEY_BYTES, ENTRY_BYTES, self._evicted)
+        self.trimmed = 0  # timestamps dropped early from a key that alone passes max_bytes
+
+    @property
+    def entries(self):
+        """Timestamps held over all keys."""
+        return self.history.entries
+
+    def add(self, key, t, n=1):
+        """Record n events for key at time t and return the key's count in the window ending at t."""
+        history = self.history
+        timestamps = history.get(key)
+        if timestamps is None:
+            history.add(key, deque((t,) * n), n)
+            self.wheel.schedule(t + self.window, self, key, t)
+            return n
+        timestamps.extend((t,) * n)
+
+        horizon = t - self.window
+        expired = 0
+        while timestamps[0] <= horizon:
+            timestamps.popleft()
+            expired += 1
+        history.grow(n - expired)
+        trimmed = 0
+        while trimmed < n and history.over_bytes():
+            # This key alone holds more than the byte cap (e.g. one service under a flood): drop its oldest
+            # timestamps, so its count stops growing instead of the memory
+            timestamps.popleft()
+            history.shrink()
+            trimmed += 1
+        self.trimmed += trimmed
+        return len(timestamps)
+
+    def count(self, key):
+        """Events of key in its window as of its last add()."""
+        timestamps = self.history.peek(key)
+        return len(timestamps) if timestamps is not None else 0
+
+    def expire(self, key, now):
+        """TimingWheel callback: drop key's timestamps that left the window by now."""
+        timestamps = self.history.peek(key)
+        if timestamps is None:
+            return
+        horizon = now - self.window
+        expired = 0
+        while timestamps and timestamps[0] <= horizon:
+            timestamps.popleft()
+            expired += 1
+        self.history.shrink(expired)
+        if timestamps:
+            self.wheel.schedule(timestamps[0] + self.window, self, key, now)
+        else:
+            self.history.pop(key)
+
+    def _evicted(self, key, timestamps):
+        self.wheel.cancel(self, key)
+        return len(timestamps)
+
+    def memory_bytes(self):
+        """Estimated memory held by the keys and timestamps."""
+        return self.history.memory_bytes()
+
+    def stats(self):
+        return dict(self.history.stats(), trimmed=self.trimmed)
+
+    def clear(self):
+        for key, _ in self.history.pairs():
+            self.wheel.cancel(self, key)
+        self.history.clear()
+
+    def __len__(self):
+        return len(self.history)
+
+
+class _Ring:
+    __slots__ = ("entries", "tallies", "serrors", "rerrors")
+
+    def __init__(self, n_tallies):
+        self.entries = deque()
+        self.tallies = [{} for _ in range(n_tallies)]
+        self.serrors = 0
+        self.rerrors = 0
+
+
+class RecentConnections:
+    """The last `size` connections per key, e.g. per destination host for the KDD dst_host_* features.
+
+    Unlike SlidingWindows this window is a number of connections, not a time span, so nothing
+    expires with the clock: a key's ring only changes when a connection is added to it. Each
+    ring holds (values, serror, rerror) summaries and keeps running totals next to them: per
+    position of values, how many connections in the ring share each value, plus the number of
+    SYN errors and rejections. add() pushes one summary in, takes the oldest one out once the
+    ring is full and adjusts the totals for both, so it is O(1) whatever the ring size.
+
+    The rings live in a StateTable bounded by max_keys / max_bytes, evicting the least recently
+    used keys beyond those.
+    """
+
+    def __init__(self, size, n_tallies, max_keys=None, max_bytes=None):
+        self.size = size
+        self.n_tallies = n_tallies
+        self.rings = StateTable(max_keys, max_bytes, RING_BYTES, SUMMARY_BYTES, lambda key, ring: len(ring.entries))
+
+    @property
+    def entries(self):
+        """Summaries held over all keys."""
+        return self.rings.entries
+
+    def add(self, key, values, serror, rerror):
+        """Record a connection for key; returns (connections in the ring, [connections sharing each
+        of values], SYN errors, rejections), this connection included."""
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = _Ring(self.n_tallies)
+            self.rings.add(key, ring)
+        entries = ring.entries
+        tallies = ring.tallies
+        if len(entries) == self.size:
+            old_values, old_serror, old_rerror = entries.popleft()
+            for tally, value in zip(tallies, old_values):
+                remaining = tally[value] - 1
+                if remaining:
+                    tally[value] = remaining
+                else:
+                    del tally[value]
+            ring.serrors -= old_serror
+            ring.rerrors -= old_rerror
+            full = True
+        else:
+            full = False
+
+        entries.append((values, serror, rerror))
+        same = []
+        for tally, value in zip(tallies, values):
+            count = tally.get(value, 0) + 1
+            tally[value] = count
+            same.append(count)
+        ring.serrors += serror
+        ring.rerrors += rerror
+        result = len(entries), same, ring.serrors, ring.rerrors
+        if not full:
+            self.rings.grow()  # last, as it may evict other rings
+        return result
+
+    def memory_bytes(self):
+        """Estimated memory held by the rings and their summaries."""
+        return self.rings.memory_bytes()
+
+    def stats(self):
+        return self.rings.stats()
+
+    def clear(self):
+        self.rings.clear()
+
+    def __len__(self):
+        return len(self.rings)
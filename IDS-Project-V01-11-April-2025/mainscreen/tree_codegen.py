@@ -0,0 +1,135 @@
+import os
+import hashlib
+import importlib.util
+import numpy as np
+
+
+def file_hash(path):
+    """SHA-256 of a file, used to tell whether a generated artifact is stale."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tree_source(tree, index):
+    """Nested if/else source for one fitted sklearn tree, returning its leaf class distribution."""
+    values = tree.value[:, 0, :]
+    lines = [f"def tree_{index}(x):"]
+
+    def emit(node, depth):
+        indent = "    " * depth
+        left = tree.children_left[node]
+        if left == -1:
+            leaf = values[node].astype(np.float64)
+            total = leaf.sum()
+            if total == 0.0:
+                total = 1.0
+            lines.append(f"{indent}return ({', '.join(repr(float(v / total)) for v in leaf)},)")
+            return
+        lines.append(f"{indent}if x[{tree.feature[node]}] <= {float(tree.threshold[node])!r}:")
+        emit(left, depth + 1)
+        lines.append(f"{indent}else:")
+        emit(tree.children_right[node], depth + 1)
+
+    emit(0, 1)
+    return "\n".join(lines)
+
+
+def generate_source(model, model_hash):
+    """Python source for a module that evaluates the forest on a single sample.
+
+    One function per tree plus predict_proba(x), which sums the trees' class
+    distributions in order and averages them like RandomForestClassifier does.
+    x must hold float32-rounded values (see CodegenForest.predict_proba).
+    """
+    n_classes = len(model.classes_)
+    n_trees = len(model.estimators_)
+    parts = [
+        "# Generated by tree_codegen.py from the trained RandomForestClassifier. Do not edit.",
+        f"MODEL_HASH = {model_hash!r}",
+        f"N_CLASSES = {n_classes}",
+        f"N_TREES = {n_trees}",
+        "",
+    ]
+    for index, estimator in enumerate(model.estimators_):
+        parts.append(_tree_source(estimator.tree_, index))
+        parts.append("")
+
+    totals = [f"p{i}" for i in range(n_classes)]
+    leaves = [f"v{i}" for i in range(n_classes)]
+    parts.append(f"TREES = ({', '.join(f'tree_{i}' for i in range(n_trees))},)")
+    parts.append("")
+    parts.append("def predict_proba(x):")
+    parts.append(f"    {' = '.join(totals)} = 0.0")
+    parts.append("    for tree in TREES:")
+    parts.append(f"        {', '.join(leaves)} = tree(x)")
+    for total, leaf in zip(totals, leaves):
+        parts.append(f"        {total} += {leaf}")
+    parts.append(f"    return ({', '.join(f'{total} / N_TREES' for total in totals)},)")
+    parts.append("")
+    return "\n".join(parts)
+
+
+class CodegenForest:
+    """Wraps a generated single-sample evaluator module with a predict_proba(X) like sklearn's."""
+
+    def __init__(self, module):
+        self.module = module
+        self.model_hash = module.MODEL_HASH
+        self.n_classes = module.N_CLASSES
+        self.n_trees = module.N_TREES
+
+    def predict_one(self, row):
+        # sklearn rounds inputs to float32 before comparing against the float64 thresholds
+        return self.module.predict_proba(np.asarray(row, dtype=np.float32).tolist())
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        predict = self.module.predict_proba
+        return np.array([predict(row) for row in X.tolist()], dtype=np.float64).reshape(len(X), self.n_classes)
+
+
+def _import_generated(path):
+    spec = importlib.util.spec_from_file_location("rf_model_codegen", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _cached_hash(path):
+    # The hash is on the second line of the generated file, no need to import it to check
+    try:
+        with open(path, "r") as file:
+            file.readline()
+            line = file.readline()
+    except OSError:
+        return None
+    if line.startswith("MODEL_HASH = "):
+        return line.split("=", 1)[1].strip().strip("'\"")
+    return None
+
+
+def load_or_generate(model_path, generated_path, load_model):
+    """Import the generated evaluator, regenerating it when the model's hash has changed.
+
+    load_model() is only called (and the pickle only unpickled) when the code is regenerated.
+    """
+    model_hash = file_hash(model_path)
+    if _cached_hash(generated_path) != model_hash:
+        source = generate_source(load_model(), model_hash)
+        temp_path = generated_path + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(source)
+        os.replace(temp_path, generated_path)
+    return CodegenForest(_import_generated(generated_path))
+
+
+if __name__ == "__main__":
+    import joblib
+
+    model_path = "models/rf_model_resampled.pkl"
+    generated_path = "models/rf_model_resampled_codegen.py"
+    forest = load_or_generate(model_path, generated_path, lambda: joblib.load(model_path))
+    print(f"Generated {forest.n_trees} tree functions in {generated_path} (model hash {forest.model_hash[:12]})")
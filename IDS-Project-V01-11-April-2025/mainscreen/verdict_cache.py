@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class VerdictCache:
+    """Bounded LRU cache from an encoded feature row to its class-probability vector.
+
+    Runtime feature vectors repeat constantly during floods, so most rows can skip
+    the forest entirely. Byte counts and rates can optionally be bucketed to raise
+    the hit rate; bucketing is applied to the rows themselves, so cached and freshly
+    classified packets always see the same model input.
+
+    The cache is tied to a token (model version + thresholds); validate() clears it
+    whenever the token changes and re-resolves the bucketed columns for the new model.
+    """
+
+    def __init__(self, max_entries=4096, byte_columns=(), byte_bucket=0, rate_columns=(), rate_decimals=None):
+        self.max_entries = max_entries
+        self.byte_columns = byte_columns if byte_bucket else ()
+        self.byte_bucket = byte_bucket
+        self.rate_columns = rate_columns if rate_decimals is not None else ()
+        self.rate_decimals = rate_decimals
+        self.byte_offsets = []
+        self.rate_offsets = []
+
+        self.entries = OrderedDict()
+        self.token = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def validate(self, token, numeric_index):
+        """Drop everything if the model or thresholds changed since the cache was filled.
+
+        numeric_index is the encoder's column name -> offset map for the current model.
+        """
+        if token != self.token:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.token = token
+            self.byte_offsets = [numeric_index[c] for c in self.byte_columns if c in numeric_index]
+            self.rate_offsets = [numeric_index[c] for c in self.rate_columns if c in numeric_index]
+
+    def quantize(self, rows):
+        """Bucket byte counts and round rates in place (no-op unless bucketing is enabled)."""
+        if self.byte_offsets:
+            rows[:, self.byte_offsets] = np.floor(rows[:, self.byte_offsets] / self.byte_bucket) * self.byte_bucket
+        if self.rate_offsets:
+            rows[:, self.rate_offsets] = np.round(rows[:, self.rate_offsets], self.rate_decimals)
+        return rows
+
+    def predict_proba(self, rows, classify_fn):
+        """Class probabilities for rows, running classify_fn only on the cache misses."""
+        self.quantize(rows)
+        keys = [row.tobytes() for row in rows]
+        results = [None] * len(keys)
+        # Misses keyed by vector, so repeats inside one batch are classified only once
+        missing = {}
+
+        for i, key in enumerate(keys):
+            probabilities = self.entries.get(key)
+            if probabilities is not None:
+                self.entries.move_to_end(key)
+                results[i] = probabilities
+            elif key in missing:
+                missing[key].append(i)
+            else:
+                missing[key] = [i]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        if missing:
+            first_rows = [positions[0] for positions in missing.values()]
+            computed = classify_fn(rows[first_rows])
+            for (key, positions), probabilities in zip(missing.items(), computed):
+                for i in positions:
+                    results[i] = probabilities
+                self.entries[key] = probabilities
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return np.array(results)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,268 @@
+import time
+import logging
+import queue
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+
+logger = logging.getLogger("ids.worker_pool")
+
+
+def _inputs_nbytes(n_slots, slot_inputs):
+    """Size of the float32 input area, rounded up so the float64 outputs after it stay 8-byte aligned."""
+    return (n_slots * slot_inputs * 4 + 7) // 8 * 8
+
+
+def _ring_views(buf, n_slots, slot_inputs, slot_outputs):
+    """The (n_slots, slot_inputs) float32 input and (n_slots, slot_outputs) float64 output arrays inside one shared block."""
+    inputs = np.ndarray((n_slots, slot_inputs), dtype=np.float32, buffer=buf)
+    outputs = np.ndarray((n_slots, slot_outputs), dtype=np.float64, buffer=buf,
+                         offset=_inputs_nbytes(n_slots, slot_inputs))
+    return inputs, outputs
+
+
+def _worker_main(worker_id, shm_name, layout, paths, backend, use_cascade, use_protocol_models, tasks, done, ready):
+    """Classifier process: loads its own artifact set, then serves ring slots until it gets None."""
+    import os
+    from model_handle import ModelArtifacts
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    inputs, outputs = _ring_views(shm.buf, *layout)
+    checked_mtime = os.path.getmtime(paths["model"])
+    artifacts = ModelArtifacts(paths, backend, use_cascade, use_protocol_models=use_protocol_models)
+    ready.put(worker_id)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slot, n_rows, n_features, version = task
+        done.put((slot, worker_id))  # taken: the pool now knows whose death loses this slot
+        started = time.perf_counter()
+        error = None
+        try:
+            if artifacts.version != version:
+                # The monitor swapped in a retrained model. Only the version it validated and sent is used:
+                # the file on disk may already be newer (not swapped in yet, or rejected by the canary check)
+                mtime = os.path.getmtime(paths["model"])
+                if mtime != checked_mtime:
+                    checked_mtime = mtime
+                    loaded = ModelArtifacts(paths, backend, use_cascade, use_protocol_models=use_protocol_models)
+                    if loaded.version == version:
+                        artifacts = loaded
+                if artifacts.version != version:
+                    raise RuntimeError(f"model version {version} requested, worker has {artifacts.version}")
+            rows = inputs[slot, :n_rows * n_features].reshape(n_rows, n_features)
+            probabilities = np.asarray(artifacts.predict_proba(rows), dtype=np.float64)
+            outputs[slot, :probabilities.size] = probabilities.ravel()
+        except Exception as e:
+            error = str(e)
+        done.put((slot, worker_id, n_rows, started, time.perf_counter() - started, error))
+
+    del inputs, outputs
+    shm.close()
+
+
+class InferencePool:
+    """Classifies batches of encoded rows in separate processes, so inference is not limited by the GIL.
+
+    Batches are copied into slots of a shared-memory ring and only the slot number travels
+    through a queue; each worker loads its own model (the memory-mapped compiled forest is
+    shared between them) and writes the probabilities back into the same slot. Results are
+    handed to on_batch in submission order from collect(), which the GUI thread calls on a
+    timer, so alerting and database logging keep a single writer.
+
+    A batch whose worker died, or that is not back within batch_timeout seconds, is classified
+    in-process with fallback_fn instead; with no worker left, submit() does that straight away.
+    The slot of a batch a hung worker may still write to is only reused once its result arrives.
+    """
+
+    def __init__(self, paths, backend, use_cascade, n_workers, n_features, n_classes, on_batch,
+                 max_batch_size=64, n_slots=None, fallback_fn=None, use_protocol_models=False, batch_timeout=10.0):
+        self.on_batch = on_batch
+        self.fallback_fn = fallback_fn
+        self.batch_timeout = batch_timeout
+        self.max_batch_size = max_batch_size
+        self.n_slots = n_slots or 4 * n_workers
+        self.slot_inputs = max_batch_size * n_features
+        self.slot_outputs = max_batch_size * n_classes
+
+        inputs_bytes = _inputs_nbytes(self.n_slots, self.slot_inputs)
+        outputs_bytes = self.n_slots * self.slot_outputs * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=inputs_bytes + outputs_bytes)
+        self.inputs, self.outputs = _ring_views(self.shm.buf, self.n_slots, self.slot_inputs, self.slot_outputs)
+
+        # spawn everywhere: forking a process that runs Qt and capture threads is not safe
+        ctx = multiprocessing.get_context("spawn")
+        self.tasks = ctx.Queue()
+        self.done = ctx.Queue()
+        self.ready = ctx.Queue()
+        layout = (self.n_slots, self.slot_inputs, self.slot_outputs)
+        self.workers = [
+            ctx.Process(target=_worker_main, daemon=True,
+                        args=(i, self.shm.name, layout, paths, backend, use_cascade, use_protocol_models,
+                              self.tasks, self.done, self.ready))
+            for i in range(n_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+        self.free_slots = deque(range(self.n_slots))
+        self.in_flight = deque()  # slots in submission order
+        self.pending = {}  # slot -> [contexts, n_rows, n_features, n_classes, wait_ms, submitted, worker, result]
+        self.abandoned = {}  # slot given up on -> worker that took it (None if not taken yet)
+
+        # Per-batch report of the last delivered batch, same names as MicroBatcher
+        self.last_batch_size = 0
+        self.last_wait_ms = 0.0
+        self.last_inference_ms = 0.0
+        self.total_batches = 0
+        self.total_rows = 0
+        self.failed_batches = 0
+        self.worker_rows = [0] * n_workers
+        self.worker_busy = [0.0] * n_workers
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its model. Returns False on timeout."""
+        try:
+            for _ in self.workers:
+                self.ready.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.in_flight)
+
+    def submit(self, rows, contexts, version, n_classes, wait_ms=0.0):
+        """Copy a batch into a free ring slot and queue it. Blocks (collecting results) while the ring is full."""
+        n_rows, n_features = rows.shape
+        if n_rows * n_features > self.slot_inputs or n_rows * n_classes > self.slot_outputs:
+            raise ValueError(f"batch of {n_rows}x{n_features} does not fit a ring slot")
+        while not self.free_slots:
+            if not self.in_flight or not self.workers_alive():
+                # Every slot is held by a hung worker, or no worker is left: classify here
+                self.collect()
+                started = time.perf_counter()
+                probabilities = self.fallback_fn(rows.copy())
+                self.failed_batches += 1
+                self._deliver(contexts, probabilities, n_rows, wait_ms, time.perf_counter() - started)
+                return
+            self.collect(block=True)
+
+        slot = self.free_slots.popleft()
+        self.inputs[slot, :rows.size] = rows.ravel()
+        self.pending[slot] = [contexts, n_rows, n_features, n_classes, wait_ms, time.perf_counter(), None, None]
+        self.in_flight.append(slot)
+        self.tasks.put((slot, n_rows, n_features, version))
+
+    def workers_alive(self):
+        return any(worker.is_alive() for worker in self.workers)
+
+    def collect(self, block=False):
+        """Hand finished batches to on_batch in the order they were submitted."""
+        while True:
+            try:
+                message = self.done.get(block=block and bool(self.in_flight), timeout=1.0 if block else None)
+            except queue.Empty:
+                break
+            block = False
+            if len(message) == 2:
+                slot, worker_id = message
+                if slot in self.abandoned:
+                    self.abandoned[slot] = worker_id
+                elif slot in self.pending:
+                    self.pending[slot][6] = worker_id
+                continue
+            slot, worker_id, n_rows, started, elapsed, error = message
+            self.worker_rows[worker_id] += n_rows
+            self.worker_busy[worker_id] += elapsed
+            if slot in self.abandoned:
+                # Late result of a batch already classified in-process: the slot is free again
+                del self.abandoned[slot]
+                self.free_slots.append(slot)
+                continue
+            if slot in self.pending:
+                self.pending[slot][-1] = (started, elapsed, error)
+        self._check_workers()
+
+        while self.in_flight and self.pending[self.in_flight[0]][-1] is not None:
+            slot = self.in_flight.popleft()
+            contexts, n_rows, n_features, n_classes, wait_ms, submitted, worker, (started, elapsed, error) = \
+                self.pending.pop(slot)
+            if error is None:
+                probabilities = self.outputs[slot, :n_rows * n_classes].reshape(n_rows, n_classes).copy()
+                self.free_slots.append(slot)
+            else:
+                # Classify in this process instead of dropping the batch
+                logger.warning("❌ Worker failed a batch (%s), classifying it in-process", error)
+                self.failed_batches += 1
+                probabilities = self.fallback_fn(self.inputs[slot, :n_rows * n_features].reshape(n_rows, n_features).copy())
+                if slot in self.abandoned:
+                    self._release_abandoned()
+                else:
+                    self.free_slots.append(slot)
+            self._deliver(contexts, probabilities, n_rows, wait_ms + max(0.0, started - submitted) * 1000.0, elapsed)
+
+    def _check_workers(self):
+        """Fail the batches of dead workers and the ones past batch_timeout, so nothing waits on them forever."""
+        now = time.perf_counter()
+        any_alive = self.workers_alive()
+        for slot in self.in_flight:
+            entry = self.pending[slot]
+            if entry[-1] is not None:
+                continue
+            worker = entry[6]
+            if worker is not None and not self.workers[worker].is_alive():
+                error = f"worker {worker} died"
+            elif worker is None and not any_alive:
+                error = "no worker left"
+            elif now - entry[5] > self.batch_timeout:
+                error = f"no result after {self.batch_timeout:.0f} s"
+            else:
+                continue
+            entry[-1] = (now, 0.0, error)
+            # A live worker may still write this slot, so it is only reused once its result arrives
+            self.abandoned[slot] = worker
+        self._release_abandoned()
+
+    def _release_abandoned(self):
+        """Reuse the abandoned slots no worker can write to any more (and that are delivered)."""
+        any_alive = self.workers_alive()
+        for slot, worker in list(self.abandoned.items()):
+            if slot in self.pending:
+                continue
+            if (not self.workers[worker].is_alive()) if worker is not None else not any_alive:
+                del self.abandoned[slot]
+                self.free_slots.append(slot)
+
+    def _deliver(self, contexts, probabilities, n_rows, wait_ms, elapsed):
+        self.last_batch_size = n_rows
+        self.last_wait_ms = wait_ms
+        self.last_inference_ms = elapsed * 1000.0
+        self.total_batches += 1
+        self.total_rows += n_rows
+        self.on_batch(contexts, probabilities)
+
+    def drain(self):
+        """Wait for and deliver every batch still in flight (failing those of dead or hung workers)."""
+        while self.in_flight:
+            self.collect(block=True)
+
+    def worker_stats(self):
+        """Rows classified and throughput (rows per busy second) of each worker."""
+        return [{"worker": i, "rows": rows, "rows_per_s": rows / busy if busy else 0.0}
+                for i, (rows, busy) in enumerate(zip(self.worker_rows, self.worker_busy))]
+
+    def close(self):
+        self.drain()
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        del self.inputs, self.outputs
+        self.shm.close()
+        self.shm.unlink()
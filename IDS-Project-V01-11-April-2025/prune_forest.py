@@ -0,0 +1,176 @@
+# Forest pruning and distillation tool
+# Builds smaller candidates from the saved forest, measures accuracy and inference cost for each one
+# and writes the Pareto frontier (best accuracy for a given latency) to models/pruning_frontier.csv.
+#
+# Usage: python prune_forest.py                -> evaluate all candidates
+#        python prune_forest.py --export NAME  -> also save candidate NAME as models/rf_model_resampled.pkl
+#                                                 (the current model is kept as models/rf_model_resampled_original.pkl)
+import os
+import sys
+import copy
+import csv
+import time
+import shutil
+import numpy as np
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, recall_score
+from kdd_data import load_dataset, split_dataset, save_artifact
+
+sys.path.insert(0, "mainscreen")
+from compiled_forest import compile_forest
+
+MODEL_PATH = "models/rf_model_resampled.pkl"
+BACKUP_PATH = "models/rf_model_resampled_original.pkl"
+FRONTIER_PATH = "models/pruning_frontier.csv"
+
+TREE_COUNTS = [10, 25, 50, 100]
+DEPTH_CAPS = [4, 6, 8]
+COMBINED = [(50, 8), (25, 6)]  # (trees, depth)
+STUDENTS = [(10, 8), (25, 8), (25, 10)]  # (trees, depth) of distilled student forests
+
+
+def with_trees(model, n_trees):
+    """The same forest keeping only its first n_trees trees."""
+    pruned = copy.copy(model)
+    pruned.estimators_ = model.estimators_[:n_trees]
+    pruned.n_estimators = n_trees
+    return pruned
+
+
+def cap_tree_depth(estimator, max_depth):
+    """Copy of a fitted decision tree cut at max_depth; nodes at that depth become leaves.
+
+    Internal nodes already hold the class distribution of the samples that reached them,
+    so a cut node simply predicts that distribution. Unreachable nodes are dropped.
+    """
+    estimator = copy.deepcopy(estimator)
+    state = estimator.tree_.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Depth-first walk renumbering the nodes we keep
+    order, new_ids = [], {}
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        new_ids[node] = len(order)
+        order.append((node, depth))
+        if nodes["left_child"][node] != -1 and depth < max_depth:
+            stack.append((nodes["right_child"][node], depth + 1))
+            stack.append((nodes["left_child"][node], depth + 1))
+
+    kept = [node for node, _ in order]
+    new_nodes = nodes[kept].copy()
+    for i, (node, depth) in enumerate(order):
+        if nodes["left_child"][node] == -1 or depth >= max_depth:
+            new_nodes["left_child"][i] = new_nodes["right_child"][i] = -1
+            new_nodes["feature"][i] = -2
+            new_nodes["threshold"][i] = -2.0
+        else:
+            new_nodes["left_child"][i] = new_ids[nodes["left_child"][node]]
+            new_nodes["right_child"][i] = new_ids[nodes["right_child"][node]]
+
+    estimator.tree_.__setstate__(dict(state, nodes=new_nodes, values=values[kept].copy(),
+                                      node_count=len(kept), max_depth=min(state["max_depth"], max_depth)))
+    return estimator
+
+
+def with_depth(model, max_depth):
+    capped = copy.copy(model)
+    capped.estimators_ = [cap_tree_depth(estimator, max_depth) for estimator in model.estimators_]
+    capped.max_depth = max_depth
+    return capped
+
+
+def latency_us(forest, rows, repeat):
+    """Average time per row in microseconds, measured on the compiled forest the monitor runs."""
+    forest.predict_proba(rows)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        forest.predict_proba(rows)
+    return (time.perf_counter() - started) / repeat / len(rows) * 1e6
+
+
+def pareto_frontier(results):
+    """Candidates no other candidate beats on accuracy and both latencies at once."""
+    def dominates(a, b):
+        no_worse = (a["accuracy"] >= b["accuracy"] and a["single_us"] <= b["single_us"]
+                    and a["batch_us"] <= b["batch_us"])
+        better = (a["accuracy"] > b["accuracy"] or a["single_us"] < b["single_us"]
+                  or a["batch_us"] < b["batch_us"])
+        return no_worse and better
+    return [r for r in results if not any(dominates(other, r) for other in results if other is not r)]
+
+
+model = joblib.load(MODEL_PATH)
+encoded_columns = joblib.load("models/encoded_columns_resampled.pkl")
+label_encoder = joblib.load("models/label_encoder_resampled.pkl")
+
+data = load_dataset()
+data["label"] = label_encoder.transform(data["label"])
+X = data.drop("label", axis=1).reindex(columns=encoded_columns, fill_value=0)
+X_train, X_test, y_train, y_test = split_dataset(X, data["label"])
+X_test = X_test.to_numpy(dtype=np.float32)
+
+candidates = {"original": model}
+for n_trees in TREE_COUNTS:
+    candidates[f"trees={n_trees}"] = with_trees(model, n_trees)
+for max_depth in DEPTH_CAPS:
+    candidates[f"depth={max_depth}"] = with_depth(model, max_depth)
+for n_trees, max_depth in COMBINED:
+    candidates[f"trees={n_trees},depth={max_depth}"] = with_depth(with_trees(model, n_trees), max_depth)
+
+# Distillation: train compact students on the full forest's own predictions
+teacher_labels = model.predict(X_train)
+for n_trees, max_depth in STUDENTS:
+    student = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, max_features="sqrt",
+                                     n_jobs=2, random_state=42)
+    student.fit(X_train, teacher_labels)
+    if list(student.classes_) != list(model.classes_):
+        print(f"Skipping student {n_trees}x{max_depth}: teacher never predicts some classes on the training set")
+        continue
+    candidates[f"student={n_trees}x{max_depth}"] = student
+
+results = []
+for name, candidate in candidates.items():
+    y_pred = candidate.predict(X_test)
+    forest = compile_forest(candidate)
+    result = {
+        "name": name,
+        "trees": len(candidate.estimators_),
+        "nodes": len(forest.feature),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "single_us": latency_us(forest, X_test[:1], 200),
+        "batch_us": latency_us(forest, X_test[:64], 50),
+    }
+    per_class = recall_score(y_test, y_pred, labels=model.classes_, average=None, zero_division=0)
+    for label, recall in zip(label_encoder.classes_, per_class):
+        result[f"acc_{label}"] = recall
+    results.append(result)
+
+frontier = pareto_frontier(results)
+class_columns = [f"acc_{label}" for label in label_encoder.classes_]
+header = f"{'candidate':<22} {'trees':>5} {'nodes':>7} {'accuracy':>9} " + \
+         " ".join(f"{c:>10}" for c in class_columns) + f" {'1 row us':>9} {'64 rows us/row':>15}"
+print(header)
+for r in sorted(results, key=lambda r: r["batch_us"]):
+    marker = "*" if r in frontier else " "
+    print(f"{marker}{r['name']:<21} {r['trees']:>5} {r['nodes']:>7} {r['accuracy']:>9.4f} " +
+          " ".join(f"{r[c]:>10.4f}" for c in class_columns) +
+          f" {r['single_us']:>9.1f} {r['batch_us']:>15.1f}")
+print("* = on the Pareto frontier")
+
+with open(FRONTIER_PATH, "w", newline="") as file:
+    writer = csv.DictWriter(file, fieldnames=list(results[0].keys()))
+    writer.writeheader()
+    writer.writerows(sorted(frontier, key=lambda r: r["batch_us"]))
+print(f"Frontier written to {FRONTIER_PATH}")
+
+if "--export" in sys.argv:
+    name = sys.argv[sys.argv.index("--export") + 1]
+    if name not in candidates:
+        sys.exit(f"Unknown candidate {name!r}, choose one of: {', '.join(candidates)}")
+    if not os.path.exists(BACKUP_PATH):
+        shutil.copyfile(MODEL_PATH, BACKUP_PATH)
+    save_artifact(candidates[name], MODEL_PATH)
+    print(f"Saved {name} as {MODEL_PATH} (original kept in {BACKUP_PATH})")
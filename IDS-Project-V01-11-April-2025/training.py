@@ -1,64 +1,94 @@
 # Import necessary libraries
-import pandas as pd
+# Usage: python training.py            -> full model on all KDD features (models/*_resampled.pkl)
+#        python training.py --reduced  -> narrow model on only the features the live extractor computes
+#                                         (models/*_reduced.pkl), plus a comparison against the full model
+#        python training.py --per-protocol -> also one smaller model per protocol_type
+#                                         (models/protocol_models_*.pkl), plus a comparison against the single model
+#        python training.py --reduced --connection -> narrow model on the features of FEATURE_MODE = "connection"
+#                                         (duration, land, urgent, KDD flags and service names on top)
+#        (--reduced and --per-protocol can be combined)
+import os
+import pickle
+import sys
+import time
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.preprocessing import LabelEncoder
 import joblib
+from kdd_data import load_dataset, split_dataset, save_artifact
+
+REDUCED = "--reduced" in sys.argv
+PER_PROTOCOL = "--per-protocol" in sys.argv
+FEATURE_MODE = "connection" if "--connection" in sys.argv else "packet"
+MODEL_VARIANT = "reduced" if REDUCED else "resampled"
+
+# Columns that monitoring fills at runtime in each FEATURE_MODE (see monitoring.py). Every other
+# column of the full model is always zero on live traffic.
+LIVE_NUMERIC_FEATURES = ["src_bytes", "dst_bytes", "count", "srv_count", "same_srv_rate", "diff_srv_rate",
+                         "dst_host_count", "dst_host_srv_count", "dst_host_same_srv_rate", "dst_host_diff_srv_rate",
+                         "dst_host_same_src_port_rate", "dst_host_srv_diff_host_rate", "dst_host_serror_rate",
+                         "dst_host_srv_serror_rate", "dst_host_rerror_rate", "dst_host_srv_rerror_rate"]
+if FEATURE_MODE == "packet":
+    LIVE_CATEGORY_VALUES = {
+        "protocol_type": ["icmp", "tcp", "udp"],
+        "service": ["http", "https", "tcp", "dns", "udp", "other"],
+        "flag": [],  # Packet mode uses raw TCP flag integers, which never match KDD flag names
+    }
+else:
+    sys.path.insert(0, "mainscreen")
+    from flow_table import TCP_SERVICES, UDP_SERVICES, ICMP_SERVICES
+
+    # monitoring.connection_features() adds these from the flow table's connection records,
+    # with the KDD service names and flags flow_table.py gives them
+    LIVE_NUMERIC_FEATURES += ["duration", "land", "urgent"]
+    LIVE_CATEGORY_VALUES = {
+        "protocol_type": ["icmp", "tcp", "udp"],
+        "service": sorted({*TCP_SERVICES.values(), *UDP_SERVICES.values(), *ICMP_SERVICES.values(),
+                           "private", "oth_i", "other"}),
+        "flag": ["SF", "S0", "S1", "S2", "S3", "REJ", "RSTO", "RSTR", "RSTOS0", "RSTRH", "SH", "SHR", "OTH"],
+    }
+
+# Per-protocol models are smaller than the single forest: each one only has to separate the
+# attacks of one protocol, on the columns that vary for that protocol
+PROTOCOL_MODEL_TREES = 50
+PROTOCOL_MODEL_DEPTH = 10
+
+
+def latency_ms(predict_proba, rows, repeat=20):
+    predict_proba(rows)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        predict_proba(rows)
+    return (time.perf_counter() - started) / repeat * 1000
 
 # Load dataset
-file_path = "D:/Project/data/KDDCup99.csv"
-columns = [
-    "duration", "protocol_type", "service", "flag", "src_bytes", "dst_bytes", 
-    "land", "wrong_fragment", "urgent", "hot", "num_failed_logins", 
-    "logged_in", "num_compromised", "root_shell", "su_attempted", "num_root", 
-    "num_file_creations", "num_shells", "num_access_files", "num_outbound_cmds", 
-    "is_host_login", "is_guest_login", "count", "srv_count", "serror_rate", 
-    "srv_serror_rate", "rerror_rate", "srv_rerror_rate", "same_srv_rate", 
-    "diff_srv_rate", "srv_diff_host_rate", "dst_host_count", "dst_host_srv_count", 
-    "dst_host_same_srv_rate", "dst_host_diff_srv_rate", 
-    "dst_host_same_src_port_rate", "dst_host_srv_diff_host_rate", 
-    "dst_host_serror_rate", "dst_host_srv_serror_rate", 
-    "dst_host_rerror_rate", "dst_host_srv_rerror_rate", "label"
-]
-data = pd.read_csv(file_path, header=None, names=columns, low_memory=False)
-
-# Map attack categories
-def map_attack_category(label):
-    if label == "normal":
-        return "normal"
-    elif label in ["neptune", "smurf", "pod", "teardrop", "back", "land"]:
-        return "DoS"
-    elif label in ["satan", "ipsweep", "nmap", "portsweep"]:
-        return "Probe"
-    elif label in ["buffer_overflow", "loadmodule", "rootkit", "perl"]:
-        return "U2R"
-    elif label in ["guess_passwd", "ftp_write", "imap", "phf", "multihop", "warezmaster", "warezclient", "spy"]:
-        return "R2L"
-    else:
-        return "unknown"
-
-data['label'] = data['label'].apply(map_attack_category)
-data = data[data['label'] != "unknown"]
-
-# Encode categorical variables
-data = pd.get_dummies(data, columns=["protocol_type", "service", "flag"], drop_first=True)
+data = load_dataset()
 
 # Encode labels
 label_encoder = LabelEncoder()
 data['label'] = label_encoder.fit_transform(data['label'])
-joblib.dump(label_encoder, "models/label_encoder_resampled.pkl")
+save_artifact(label_encoder, f"models/label_encoder_{MODEL_VARIANT}.pkl")
 
 # Split data into features (X) and target (y)
 X = data.drop("label", axis=1)
 y = data["label"]
 
-# Save feature names
-joblib.dump(list(X.columns), "models/encoded_columns_resampled.pkl")
-
 # Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+X_train, X_test, y_train, y_test = split_dataset(X, y)
+X_test_full = X_test
+
+if REDUCED:
+    live_columns = set(LIVE_NUMERIC_FEATURES)
+    live_columns.update(f"{name}_{value}" for name, values in LIVE_CATEGORY_VALUES.items() for value in values)
+    reduced_columns = [col for col in X.columns if col in live_columns]
+    print(f"Reduced feature set: {len(reduced_columns)} of {len(X.columns)} columns: {reduced_columns}")
+    X_train = X_train[reduced_columns]
+    X_test = X_test[reduced_columns]
+
+# Save feature names
+save_artifact(list(X_train.columns), f"models/encoded_columns_{MODEL_VARIANT}.pkl")
 
 # Train RandomForest without SMOTE or scaling
 model = RandomForestClassifier(
@@ -80,11 +110,131 @@ y_pred = model.predict(X_test)
 print("Accuracy: ", accuracy_score(y_test, y_pred))
 print("Classification Report:\n", classification_report(y_test, y_pred, target_names=label_encoder.classes_))
 
-# Save model
-joblib.dump(model, "models/rf_model_resampled.pkl")
+# Train the cascade gate: a small normal-vs-attack model that runs before the full forest.
+# At runtime only packets the gate flags as attacks are sent to the 150-tree model.
+GATE_TARGET_RECALL = 0.995  # share of attacks the gate must pass on to the full model
+
+normal_label = label_encoder.transform(["normal"])[0]
+y_train_gate = (y_train != normal_label).astype(int)
+y_test_gate = (y_test != normal_label).astype(int)
+
+# Hold part of the training data back to tune the gate threshold
+X_gate_fit, X_gate_val, y_gate_fit, y_gate_val = train_test_split(
+    X_train, y_train_gate, test_size=0.2, stratify=y_train_gate, random_state=42)
+
+gate_model = RandomForestClassifier(
+    n_estimators=10,  # Few shallow trees, it has to be much cheaper than the full model
+    max_depth=6,
+    class_weight={0: 1, 1: 10},  # Missing an attack costs more than an extra full-model call
+    max_features="sqrt",
+    n_jobs=2,
+    random_state=42
+)
+gate_model.fit(X_gate_fit, y_gate_fit)
+
+# Pick the highest attack-probability cut-off that still passes GATE_TARGET_RECALL of the attacks
+val_attack_probs = gate_model.predict_proba(X_gate_val)[:, 1]
+gate_threshold = float(np.quantile(val_attack_probs[y_gate_val == 1], 1 - GATE_TARGET_RECALL, method="lower"))
+
+# Evaluate the cascade against the single-model path on the test set
+test_flagged = gate_model.predict_proba(X_test)[:, 1] >= gate_threshold
+y_pred_cascade = np.where(test_flagged, y_pred, normal_label)
+print("Gate threshold: ", gate_threshold)
+print("Gate attack recall: ", test_flagged[y_test_gate == 1].mean())
+print("Share of test traffic short-circuited by the gate: ", 1 - test_flagged.mean())
+print("Cascade accuracy: ", accuracy_score(y_test, y_pred_cascade), " (single model: ", accuracy_score(y_test, y_pred), ")")
+
+save_artifact({"model": gate_model, "threshold": gate_threshold}, f"models/gate_model_{MODEL_VARIANT}.pkl")
 
 # Show class distribution
 unique, counts = np.unique(y_train, return_counts=True)
 print("Class Distribution After Resampling:")
 for label, count in zip(unique, counts):
     print(f"Class {label}: {count}")
+
+# Side-by-side report of the reduced model against the full one
+if REDUCED and os.path.exists("models/rf_model_resampled.pkl"):
+    full_model = joblib.load("models/rf_model_resampled.pkl")
+    # What the full model actually sees on live traffic: every non-live column is zero
+    X_test_live = X_test_full.copy()
+    X_test_live[[col for col in X_test_full.columns if col not in reduced_columns]] = 0
+
+    print(f"\n{'model':<20} {'columns':>8} {'size MB':>8} {'accuracy':>9} {'1 row ms':>9} {'64 rows ms':>11}")
+    for name, clf, X_eval in (("full", full_model, X_test_full),
+                              ("full (live inputs)", full_model, X_test_live),
+                              ("reduced", model, X_test)):
+        X_eval = X_eval.to_numpy(dtype=np.float32)
+        print(f"{name:<20} {X_eval.shape[1]:>8} {len(pickle.dumps(clf)) / 1e6:>8.1f} "
+              f"{accuracy_score(y_test, clf.predict(X_eval)):>9.4f} "
+              f"{latency_ms(clf.predict_proba, X_eval[:1]):>9.2f} {latency_ms(clf.predict_proba, X_eval[:64]):>11.2f}")
+
+# Per-protocol models: one forest per protocol_type, trained on that protocol's rows and on the
+# columns that vary among them (the other protocols' services and flags are always zero there)
+if PER_PROTOCOL:
+    sys.path.insert(0, "mainscreen")
+    from compiled_forest import compile_forest
+    from feature_encoder import FeatureEncoder
+    from protocol_router import ProtocolRouter, indicator_columns
+
+    protocols = LIVE_CATEGORY_VALUES["protocol_type"]
+    # get_dummies(drop_first=True) left no column for one protocol; its rows have none of the others set
+    with_column = [p for p in protocols if f"protocol_type_{p}" in X_train.columns]
+
+    def protocol_of(X_part):
+        labels = np.full(len(X_part), next(p for p in protocols if p not in with_column), dtype=object)
+        for protocol in with_column:
+            labels[X_part[f"protocol_type_{protocol}"].to_numpy() == 1] = protocol
+        return labels
+
+    train_protocols = protocol_of(X_train)
+    protocol_models = {}
+    for protocol in protocols:
+        rows = train_protocols == protocol
+        if not rows.any():
+            continue
+        X_part = X_train[rows]
+        columns = [col for col in X_part.columns if X_part[col].nunique() > 1]
+        protocol_model = RandomForestClassifier(
+            n_estimators=PROTOCOL_MODEL_TREES,
+            max_depth=PROTOCOL_MODEL_DEPTH,
+            class_weight="balanced",
+            max_features="sqrt",
+            n_jobs=2,
+            random_state=42
+        )
+        protocol_model.fit(X_part[columns], y_train[rows])
+        protocol_models[protocol] = {"model": protocol_model, "columns": columns}
+    save_artifact(protocol_models, f"models/protocol_models_{MODEL_VARIANT}.pkl")
+
+    # Evaluate exactly what monitoring runs: the compiled single forest against the routed protocol forests
+    single = compile_forest(model)
+    # As in monitoring, the router's rows carry the protocol columns get_dummies dropped
+    extra_columns = indicator_columns(list(X_train.columns), protocol_models)
+    router = ProtocolRouter(protocol_models, FeatureEncoder(list(X_train.columns) + extra_columns),
+                            len(label_encoder.classes_))
+    test_protocols = protocol_of(X_test)
+    X_eval = np.column_stack([X_test.to_numpy(dtype=np.float64)]
+                             + [test_protocols == column[len("protocol_type_"):] for column in extra_columns])
+    y_eval = y_test.to_numpy()
+    y_pred_routed = router.predict_proba(X_eval, single.predict_proba).argmax(axis=1)
+
+    print(f"\n{'model':<16} {'test rows':>9} {'columns':>8} {'nodes':>7} {'size MB':>8} {'accuracy':>9} {'single model':>13}")
+    for protocol, entry in protocol_models.items():
+        rows = test_protocols == protocol
+        print(f"{protocol:<16} {rows.sum():>9} {len(entry['columns']):>8} {router.node_counts()[protocol]:>7} "
+              f"{len(pickle.dumps(entry['model'])) / 1e6:>8.1f} {accuracy_score(y_eval[rows], y_pred_routed[rows]):>9.4f} "
+              f"{accuracy_score(y_eval[rows], y_pred[rows]):>13.4f}")
+    print(f"{'per-protocol':<16} {len(y_eval):>9} {'':>8} {sum(router.node_counts().values()):>7} "
+          f"{len(pickle.dumps(protocol_models)) / 1e6:>8.1f} {accuracy_score(y_eval, y_pred_routed):>9.4f}")
+    print(f"{'single model':<16} {len(y_eval):>9} {X_test.shape[1]:>8} {len(single.feature):>7} "
+          f"{len(pickle.dumps(model)) / 1e6:>8.1f} {accuracy_score(y_eval, y_pred):>9.4f}")
+
+    route = lambda rows: router.predict_proba(rows, single.predict_proba)
+    print(f"\n{'latency (ms)':<16} {'1 row':>9} {'64 rows':>9} {'1024 rows':>10}")
+    for name, predict in (("single model", single.predict_proba), ("per-protocol", route)):
+        print(f"{name:<16} {latency_ms(predict, X_eval[:1]):>9.2f} {latency_ms(predict, X_eval[:64]):>9.2f} "
+              f"{latency_ms(predict, X_eval[:1024]):>10.2f}")
+
+# Save the model last: monitoring watches this file and hot-reloads every artifact once it changes,
+# so the gate and protocol models written above must already be the new ones
+save_artifact(model, f"models/rf_model_{MODEL_VARIANT}.pkl")